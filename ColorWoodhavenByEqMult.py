@@ -1,71 +1,25 @@
 import rhinoscriptsyntax as rs
+import scriptcontext as sc
+import Rhino
 import Rhino.Geometry as rg
 import System.Drawing.Color as Color
-import csv
-import json
 import math
+from array import array
+from parcel_index import KDTree2D
+from parcel_loader import load_parcel_points
+from colormap import LookupColormap, SPECTRAL
+from instrumentation import start_run
 
 # Input parameters
 csv_path = r"C:\Users\dhl\Downloads\updated_merged_gdf_r1_r5.csv"
+normalization = 'minmax'  # or 'quantile' / 'log' for skewed values
 
-# Function to read CSV and extract data
-def read_csv(file_path):
-    data = []
-    with open(file_path, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data.append(row)
-    return data
-
-# Function to create a spectral colormap
-def spectral_colormap(t):
-    # Define control points for the spectral colormap
-    colors = [
-        (0.0, (0.6, 0.0, 0.0)),  # Dark Red
-        (0.25, (0.9, 0.4, 0.0)),  # Orange
-        (0.5, (1.0, 1.0, 0.2)),  # Yellow
-        (0.75, (0.0, 0.6, 1.0)),  # Light Blue
-        (1.0, (0.0, 0.0, 0.4))  # Dark Blue
-    ]
-    
-    # Find the two control points that t falls between
-    for i in range(len(colors) - 1):
-        t1, c1 = colors[i]
-        t2, c2 = colors[i+1]
-        if t1 <= t <= t2:
-            # Interpolate between the two colors
-            f = (t - t1) / (t2 - t1)
-            r = c1[0] * (1-f) + c2[0] * f
-            g = c1[1] * (1-f) + c2[1] * f
-            b = c1[2] * (1-f) + c2[2] * f
-            return Color.FromArgb(int(r*255), int(g*255), int(b*255))
-    
-    # If t is out of range, return the last color
-    return Color.FromArgb(int(colors[-1][1][0]*255), int(colors[-1][1][1]*255), int(colors[-1][1][2]*255))
+# Spectral colormap, precomputed once into a lookup table of reusable Color objects
+spectral_lut = LookupColormap(SPECTRAL, size=1024, color_factory=Color.FromArgb)
 
-# Function to find nearest point
-def find_nearest_point(target_point, data_points):
-    nearest = min(data_points, key=lambda p: rs.Distance(target_point, p['point']))
-    return nearest
-
-# Function to safely extract coordinates from geometry
-def extract_coordinates(geometry_str):
-    try:
-        geom = json.loads(geometry_str)
-        if geom['type'] == 'Point':
-            return geom['coordinates']
-        elif geom['type'] == 'Polygon':
-            # For polygons, use the first point of the exterior ring
-            return geom['coordinates'][0][0]
-        else:
-            print("Unsupported geometry type: " + geom['type'])
-            return None
-    except json.JSONDecodeError:
-        print("Failed to parse geometry: " + geometry_str)
-        return None
-    except KeyError:
-        print("Invalid geometry structure: " + geometry_str)
-        return None
+# Function to build a spatial index over the data points (2D; the data points all sit at z = 0)
+def build_point_index(parcels):
+    return KDTree2D(parcels.xs, parcels.ys)
 
 # Function to get a representative point for an object
 def get_representative_point(obj):
@@ -87,23 +41,33 @@ def get_representative_point(obj):
     # If all else fails, return None
     return None
 
+# Function to apply colors to many objects in one pass through the document
+def apply_colors(object_ids, colors):
+    rs.EnableRedraw(False)
+    try:
+        for obj_id, color in zip(object_ids, colors):
+            rhino_object = sc.doc.Objects.FindId(obj_id)
+            if rhino_object is None:
+                continue
+            attributes = rhino_object.Attributes.Duplicate()
+            attributes.ColorSource = Rhino.DocObjects.ObjectColorSource.ColorFromObject
+            attributes.ObjectColor = color
+            sc.doc.Objects.ModifyAttributes(rhino_object, attributes, True)
+    finally:
+        rs.EnableRedraw(True)
+
 # Main script
-data = read_csv(csv_path)
-
-# Extract coordinates and mean values
-valid_data = []
-for row in data:
-    coords = extract_coordinates(row['geometry'])
-    if coords:
-        row['point'] = rs.CreatePoint(coords[0], coords[1], 0)  # Assuming 2D points
-        try:
-            row['equity_multiple_mean'] = float(row['equity_multiple_mean'])
-            valid_data.append(row)
-        except ValueError:
-            print("Invalid equity_multiple_mean value: " + row['equity_multiple_mean'])
-
-if not valid_data:
+run = start_run("ColorWoodhavenByEqMult")
+
+# Stream the CSV, keeping only coordinates and mean values
+with run.span("load_parcels"):
+    parcels = load_parcel_points(csv_path, value_field='equity_multiple_mean')
+print(parcels.report())
+run.count("parcels_loaded", len(parcels))
+
+if not len(parcels):
     print("No valid data found. Please check your CSV file.")
+    run.finish()
     import sys
     sys.exit()
 
@@ -112,40 +76,57 @@ building_objects = rs.ObjectsByLayer("Building_Facade")
 
 if not building_objects:
     print("No objects found in the Building_Facade layer.")
+    run.finish()
     import sys
     sys.exit()
 
-# Process each building and collect values
-building_values = []
-for obj in building_objects:
-    rep_point = get_representative_point(obj)
-    if rep_point is None:
-        print("Failed to get representative point for object: " + str(obj))
-        print("Object type: " + rs.ObjectType(obj))
-        continue
-    
-    nearest_data = find_nearest_point(rep_point, valid_data)
-    mean_value = nearest_data['equity_multiple_mean']
-    building_values.append(mean_value)
+# Build the per-run building table: object id, representative point, nearest value and color.
+# Every geometry query happens once here; later stages only read the table.
+table_ids = []
+table_x = array('d')
+table_y = array('d')
+table_z = array('d')
+progress = run.progress("Finding building points", len(building_objects))
+with run.span("representative_points"):
+    for obj in building_objects:
+        progress.update()
+        rep_point = get_representative_point(obj)
+        if rep_point is None:
+            print("Failed to get representative point for object: " + str(obj))
+            print("Object type: " + rs.ObjectType(obj))
+            run.count("buildings_skipped")
+            continue
+        table_ids.append(obj)
+        table_x.append(rep_point.X)
+        table_y.append(rep_point.Y)
+        table_z.append(rep_point.Z)
+run.count("objects_processed", len(building_objects))
+
+if not table_ids:
+    print("No representative points found for objects in the Building_Facade layer.")
+    run.finish()
+    import sys
+    sys.exit()
+
+# Look up the nearest data point for every building in one batch
+with run.span("nearest_lookup"):
+    point_index = build_point_index(parcels)
+    table_values = array('d', [parcels.values[i] for i in point_index.query(zip(table_x, table_y))])
 
 # Calculate min and max values from the buildings we're actually processing
-min_value = min(building_values)
-max_value = max(building_values)
+min_value = min(table_values)
+max_value = max(table_values)
 
-# Process each building again to apply colors
-for obj, value in zip(building_objects, building_values):
-    # Normalize the value
-    t = (value - min_value) / (max_value - min_value) if max_value != min_value else 0.5
-    
-    # Get color from spectral colormap
-    color = spectral_colormap(t)
-    
-    # Apply the color to the building in Rhino
-    rs.ObjectColor(obj, color)
+# Normalize the values and get colors from the spectral colormap
+with run.span("colormap"):
+    table_colors = spectral_lut.colors(table_values, normalization)
 
-    rep_point = get_representative_point(obj)
-    print("Colored building at ({0}, {1}, {2}) with value {3}".format(rep_point.X, rep_point.Y, rep_point.Z, value))
+# Apply all colors to the buildings in Rhino in one pass
+with run.span("apply_colors"):
+    apply_colors(table_ids, table_colors)
+run.count("buildings_colored", len(table_ids))
 
 # Output
-print("Buildings colored based on equity multiple means")
-print("Value range: {0} to {1}".format(min_value, max_value))
\ No newline at end of file
+print("Colored {0} of {1} buildings based on equity multiple means".format(len(table_ids), len(building_objects)))
+print("Value range: {0} to {1}".format(min_value, max_value))
+run.finish()
\ No newline at end of file
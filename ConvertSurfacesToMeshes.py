@@ -1,9 +1,57 @@
 import rhinoscriptsyntax as rs
 import scriptcontext as sc
+import Rhino
 import Rhino.Geometry as rg
+import System.Threading.Tasks as tasks
+import math
 import time
+from instrumentation import current, start_run
 
-def convert_surfaces_to_meshes(layer_name, new_layer, batch_size=50):
+# Meshing profiles; tolerances and edge lengths are fractions of each object's bounding-box diagonal
+MESHING_PROFILES = {
+    "coarse-analysis": {"tolerance": 0.02, "max_edge": 0.25, "min_edge": 0.01, "refine_angle": 30.0, "simple_planes": True},
+    "render": {"tolerance": 0.005, "max_edge": 0.1, "min_edge": 0.001, "refine_angle": 20.0, "simple_planes": False},
+    "fabrication": {"tolerance": 0.001, "max_edge": 0.05, "min_edge": 0.0001, "refine_angle": 10.0, "simple_planes": False},
+}
+
+def meshing_parameters_for(brep, profile="render", coarsen=1.0):
+    """Meshing parameters scaled to the brep's size; coarsen > 1 loosens them to emit fewer faces."""
+    settings = MESHING_PROFILES[profile]
+    diagonal = brep.GetBoundingBox(True).Diagonal.Length
+    parameters = rg.MeshingParameters()
+    parameters.Tolerance = settings["tolerance"] * diagonal * coarsen
+    parameters.MaximumEdgeLength = settings["max_edge"] * diagonal * coarsen
+    parameters.MinimumEdgeLength = settings["min_edge"] * diagonal
+    parameters.RefineAngle = math.radians(min(settings["refine_angle"] * coarsen, 90.0))
+    parameters.SimplePlanes = settings["simple_planes"]
+    return parameters
+
+# Limit on the coarsening factor applied to meet a face budget
+MAX_COARSEN = 64.0
+
+def mesh_memory(face_count, vertex_count):
+    """Estimated mesh memory in bytes: single-precision vertices and normals
+    (24 bytes per vertex) and four-index faces (16 bytes per face)."""
+    return vertex_count * 24 + face_count * 16
+
+def mesh_statistics(meshes):
+    """Face count, vertex count and estimated memory in bytes of a list of meshes."""
+    face_count = sum(mesh.Faces.Count for mesh in meshes)
+    vertex_count = sum(mesh.Vertices.Count for mesh in meshes)
+    return face_count, vertex_count, mesh_memory(face_count, vertex_count)
+
+def print_mesh_report(face_count, vertex_count):
+    print("Output faces: {0}, vertices: {1}".format(face_count, vertex_count))
+    print("Estimated output memory: {0:.1f} MB".format(mesh_memory(face_count, vertex_count) / (1024.0 * 1024.0)))
+
+def record_mesh_counters(surface_count, mesh_count, face_count, vertex_count):
+    run = current()
+    run.count("surfaces_processed", surface_count)
+    run.count("meshes_emitted", mesh_count)
+    run.count("faces_emitted", face_count)
+    run.count("vertices_emitted", vertex_count)
+
+def convert_surfaces_to_meshes(layer_name, new_layer, batch_size=50, profile="render"):
     objects = rs.ObjectsByLayer(layer_name)
     if not objects:
         print("No objects found on the layer {0}. Exiting.".format(layer_name))
@@ -15,46 +63,186 @@ def convert_surfaces_to_meshes(layer_name, new_layer, batch_size=50):
     total_objects = len(objects)
     surface_count = sum(1 for obj in objects if rs.IsSurface(obj))
     converted_count = 0
+    face_count = 0
+    vertex_count = 0
+    run = current()
+    progress = run.progress("Converting surfaces", total_objects)
     
     rs.EnableRedraw(False)
     
     start_time = time.time()
     
-    for i in range(0, total_objects, batch_size):
-        batch = objects[i:i + batch_size]
-        for obj in batch:
-            if rs.IsSurface(obj):
-                # Get the surface geometry
-                surface = rs.coercebrep(obj)
-                if surface:
-                    # Convert surface to mesh
-                    meshes = rg.Mesh.CreateFromBrep(surface, rg.MeshingParameters.Default)
-                    if meshes:
-                        for mesh in meshes:
-                            mesh_id = sc.doc.Objects.AddMesh(mesh)
-                            if mesh_id:
-                                rs.ObjectLayer(mesh_id, new_layer)
-                                converted_count += 1
-                        rs.DeleteObject(obj)
-        
-        rs.EnableRedraw(True)
-        sc.doc.Views.Redraw()
-        rs.EnableRedraw(False)
-        sc.escape_test(False)  # Allow user to cancel the script
+    with run.span("convert"):
+        for i in range(0, total_objects, batch_size):
+            batch = objects[i:i + batch_size]
+            for obj in batch:
+                if rs.IsSurface(obj):
+                    # Get the surface geometry
+                    surface = rs.coercebrep(obj)
+                    if surface:
+                        # Convert surface to mesh
+                        meshes = rg.Mesh.CreateFromBrep(surface, meshing_parameters_for(surface, profile))
+                        if meshes:
+                            for mesh in meshes:
+                                mesh_id = sc.doc.Objects.AddMesh(mesh)
+                                if mesh_id:
+                                    rs.ObjectLayer(mesh_id, new_layer)
+                                    converted_count += 1
+                                    face_count += mesh.Faces.Count
+                                    vertex_count += mesh.Vertices.Count
+                            rs.DeleteObject(obj)
+            
+            progress.update(len(batch))
+            rs.EnableRedraw(True)
+            sc.doc.Views.Redraw()
+            rs.EnableRedraw(False)
+            sc.escape_test(False)  # Allow user to cancel the script
     
     end_time = time.time()
     processing_time = end_time - start_time
     
     rs.EnableRedraw(True)
+    record_mesh_counters(surface_count, converted_count, face_count, vertex_count)
+    print("\nFinal Report:")
+    print("Processed {0} surfaces".format(surface_count))
+    print("Converted {0} surfaces to meshes on layer '{1}'".format(converted_count, new_layer))
+    print_mesh_report(face_count, vertex_count)
+    print("Processing time: {0:.2f} seconds".format(processing_time))
+
+def mesh_breps_parallel(breps, meshing_parameters, parallel=True):
+    """Mesh every brep with its own parameters, on the .NET thread pool when parallel.
+
+    RhinoCommon meshing is thread-safe.
+    """
+    results = [None] * len(breps)
+
+    def mesh_one(i):
+        results[i] = rg.Mesh.CreateFromBrep(breps[i], meshing_parameters[i])
+
+    if parallel:
+        tasks.Parallel.For(0, len(breps), mesh_one)
+    else:
+        for i in range(len(breps)):
+            mesh_one(i)
+    return results
+
+def apply_face_budget(breps, mesh_results, profile, face_budget, parallel=True, max_passes=5):
+    """Re-mesh objects over their share of face_budget with coarser parameters until the total fits.
+
+    The budget is split across objects in proportion to surface area, so large
+    curtain walls keep more faces than small cornices. Each pass re-meshes the
+    objects over their share with edge lengths and tolerances scaled by the
+    square root of the overshoot, compounding across passes. It stops when the
+    total is within the budget, after max_passes, or when every object over its
+    share has reached MAX_COARSEN; the caller reports any remaining overshoot.
+    """
+    areas = [brep.GetArea() for brep in breps]
+    total_area = sum(areas) or 1.0
+    shares = [max(face_budget * area / total_area, 2.0) for area in areas]
+    coarsening = [1.0] * len(breps)
+    for _ in range(max_passes):
+        counts = [sum(mesh.Faces.Count for mesh in meshes) if meshes else 0 for meshes in mesh_results]
+        if sum(counts) <= face_budget:
+            break
+        over = [i for i, (count, share) in enumerate(zip(counts, shares))
+                if count > share and coarsening[i] < MAX_COARSEN]
+        if not over:
+            break
+        for i in over:
+            coarsening[i] = min(coarsening[i] * math.sqrt(counts[i] / shares[i]), MAX_COARSEN)
+        remeshed = mesh_breps_parallel([breps[i] for i in over],
+                                       [meshing_parameters_for(breps[i], profile, coarsening[i]) for i in over], parallel)
+        mesh_results = list(mesh_results)
+        for i, meshes in zip(over, remeshed):
+            if meshes:
+                mesh_results[i] = meshes
+    return mesh_results
+
+def convert_surfaces_to_meshes_batch(layer_name, new_layer, parallel=True, profile="render", face_budget=None):
+    """Convert in three stages: coerce all breps, mesh them in parallel, then commit in one undoable step.
+
+    profile names an entry of MESHING_PROFILES; face_budget, when set, coarsens
+    the objects that exceed their share until the total face count fits (see
+    apply_face_budget), and the report shows any overshoot left at the limit.
+    """
+    objects = rs.ObjectsByLayer(layer_name)
+    if not objects:
+        print("No objects found on the layer {0}. Exiting.".format(layer_name))
+        return
+
+    if not rs.IsLayer(new_layer):
+        rs.AddLayer(new_layer)
+
+    start_time = time.time()
+    run = current()
+
+    # Stage 1: coerce every surface up front
+    source_ids = []
+    breps = []
+    with run.span("coerce"):
+        for obj in objects:
+            if rs.IsSurface(obj):
+                brep = rs.coercebrep(obj)
+                if brep:
+                    source_ids.append(obj)
+                    breps.append(brep)
+    surface_count = len(breps)
+
+    # Stage 2: mesh on the worker pool
+    with run.span("mesh"):
+        mesh_results = mesh_breps_parallel(breps, [meshing_parameters_for(brep, profile) for brep in breps], parallel)
+    if face_budget:
+        with run.span("face_budget"):
+            mesh_results = apply_face_budget(breps, mesh_results, profile, face_budget, parallel)
+    meshing_time = time.time() - start_time
+
+    # Stage 3: commit with the target layer preset on the attributes
+    attributes = Rhino.DocObjects.ObjectAttributes()
+    attributes.LayerIndex = sc.doc.Layers.FindByFullPath(new_layer, -1)
+    converted_count = 0
+    meshed_ids = []
+    rs.EnableRedraw(False)
+    undo_record = sc.doc.BeginUndoRecord("Convert surfaces to meshes")
+    try:
+        with run.span("commit"):
+            for obj, meshes in zip(source_ids, mesh_results):
+                if not meshes:
+                    continue
+                for mesh in meshes:
+                    if sc.doc.Objects.AddMesh(mesh, attributes):
+                        converted_count += 1
+                meshed_ids.append(obj)
+            rs.DeleteObjects(meshed_ids)
+    finally:
+        sc.doc.EndUndoRecord(undo_record)
+        rs.EnableRedraw(True)
+
+    processing_time = time.time() - start_time
+    face_count, vertex_count, _ = mesh_statistics([mesh for meshes in mesh_results if meshes for mesh in meshes])
+    record_mesh_counters(surface_count, converted_count, face_count, vertex_count)
     print("\nFinal Report:")
     print("Processed {0} surfaces".format(surface_count))
     print("Converted {0} surfaces to meshes on layer '{1}'".format(converted_count, new_layer))
+    print_mesh_report(face_count, vertex_count)
+    if face_budget and face_count > face_budget:
+        print("Face budget of {0} exceeded by {1} faces at the coarsening limit".format(face_budget, face_count - face_budget))
+    print("Meshing time: {0:.2f} seconds".format(meshing_time))
     print("Processing time: {0:.2f} seconds".format(processing_time))
 
 if __name__ == "__main__":
     layer_name = rs.GetString("Enter the name of the layer containing surfaces to convert", rs.CurrentLayer())
     if layer_name and rs.IsLayer(layer_name):
         new_layer = rs.GetString("Enter the name of the new layer for meshes", layer_name + "_Meshes")
-        convert_surfaces_to_meshes(layer_name, new_layer)
+        mode = rs.GetString("Conversion mode", "Batch", ["Batch", "Incremental"])
+        profile = rs.ListBox(sorted(MESHING_PROFILES), "Meshing profile", "Convert Surfaces", "render")
+        if profile not in MESHING_PROFILES:
+            profile = "render"
+        if mode == "Incremental":
+            with start_run("ConvertSurfacesToMeshes"):
+                convert_surfaces_to_meshes(layer_name, new_layer, profile=profile)
+        else:
+            face_budget = rs.GetInteger("Total face budget (0 for no limit)", 0, 0)
+            with start_run("ConvertSurfacesToMeshes"):
+                convert_surfaces_to_meshes_batch(layer_name, new_layer, profile=profile, face_budget=face_budget or None)
     else:
         print("Invalid layer name. Exiting.")
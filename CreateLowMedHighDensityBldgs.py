@@ -1,5 +1,17 @@
 import rhinoscriptsyntax as rs
 
+from massing import solve_massing_cached
+
+
+def add_floor_plates(x, y, plates):
+    """Add one box per (x, y, z, width, depth, height) plate, offset to the lot corner (x, y)."""
+    for px, py, z, width, depth, height in plates:
+        x0, y0 = x + px, y + py
+        x1, y1, z1 = x0 + width, y0 + depth, z + height
+        rs.AddBox([(x0, y0, z), (x1, y0, z), (x1, y1, z), (x0, y1, z),
+                   (x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)])
+
+
 def create_buildings():
     # Lot dimensions and properties
     lot_sizes = [(25, 95), (40, 95), (100, 95)]  # Low, medium, high density
@@ -19,115 +31,25 @@ def create_buildings():
     spacing_x = 20
     spacing_y = 20
 
-    for i in range(2):  # Rows
-        for j in range(3):  # Columns
-            lot_width, lot_length = lot_sizes[j]
-            lot_area = lot_width * lot_length
-            max_floor_area = far_limits[j] * lot_area
-
-            # Calculate the base position for each lot
-            x = start_x + j * (lot_width + spacing_x)
-            y = start_y + i * (lot_length + spacing_y)
-            
-            if j == 0:  # Low density
-                building1_width = lot_width - side_yard_low
-                building1_length = lot_length - front_yard - rear_yard
-                building1_area = building1_width * building1_length
-                building1_height = min_floor_height  # Assume single-floor buildings for low density
-
-                rs.AddBox([(x, y + front_yard, 0), (x + building1_width, y + front_yard, 0),
-                           (x + building1_width, y + front_yard + building1_length, 0), (x, y + front_yard + building1_length, 0),
-                           (x, y + front_yard, building1_height), (x + building1_width, y + front_yard, building1_height),
-                           (x + building1_width, y + front_yard + building1_length, building1_height), (x, y + front_yard + building1_length, building1_height)])
-                
-                building2_width = lot_width - 2 * side_yard_low
-                building2_area = building2_width * building1_length
-                building2_height = min_floor_height  # Assume single-floor buildings for low density
-
-                rs.AddBox([(x + side_yard_low, y + front_yard, 0), (x + side_yard_low + building2_width, y + front_yard, 0),
-                           (x + side_yard_low + building2_width, y + front_yard + building1_length, 0), (x + side_yard_low, y + front_yard + building1_length, 0),
-                           (x + side_yard_low, y + front_yard, building2_height), (x + side_yard_low + building2_width, y + front_yard, building2_height),
-                           (x + side_yard_low + building2_width, y + front_yard + building1_length, building2_height), (x + side_yard_low, y + front_yard + building1_length, building2_height)])
-            
-            elif j == 1:  # Medium density
-                if i == 0:  # Front building
-                    total_floor_area = max_floor_area / num_floors
-                    current_height = 0
-                    building_width = lot_width * 0.6
-
-                    for k in range(num_floors):
-                        floor_height = min_floor_height
-                        floor_area = building_width * (lot_length - front_yard - rear_yard)
-
-                        if floor_area > total_floor_area:
-                            # Adjust the footprint to meet the FAR requirement
-                            building_width = total_floor_area / (lot_length - front_yard - rear_yard)
-                            floor_area = total_floor_area
-
-                        rs.AddBox([(x + (lot_width - building_width) / 2, y + front_yard, current_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard, current_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard + lot_length - rear_yard, current_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard + lot_length - rear_yard, current_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard, current_height + floor_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard, current_height + floor_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard + lot_length - rear_yard, current_height + floor_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard + lot_length - rear_yard, current_height + floor_height)])
-                        
-                        building_width *= 0.9
-                        current_height += floor_height
-
-                if i == 1:  # Back building (mirrored inverted pyramid style)
-                    current_height = 0
-                    building_width = lot_width * 0.6 * (0.9 ** 3)
-
-                    for k in range(num_floors):
-                        floor_height = min_floor_height
-                        floor_area = building_width * (lot_length - front_yard - rear_yard)
-
-                        if floor_area > total_floor_area:
-                            # Adjust the footprint to meet the FAR requirement
-                            building_width = total_floor_area / (lot_length - front_yard - rear_yard)
-                            floor_area = total_floor_area
-
-                        rs.AddBox([(x + (lot_width - building_width) / 2, y + front_yard, current_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard, current_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard + lot_length - rear_yard, current_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard + lot_length - rear_yard, current_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard, current_height + floor_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard, current_height + floor_height),
-                                   (x + (lot_width + building_width) / 2, y + front_yard + lot_length - rear_yard, current_height + floor_height),
-                                   (x + (lot_width - building_width) / 2, y + front_yard + lot_length - rear_yard, current_height + floor_height)])
-                        
-                        building_width /= 0.9
-                        current_height += floor_height
-
-            elif j == 2:  # High density
-                total_floor_area = max_floor_area / num_floors
-                current_height = 0
-
-                for k in range(num_floors):
-                    building_width = lot_width * (1 - 0.1 * k)
-                    building_length = lot_length * (1 - 0.1 * k) - rear_yard
-                    floor_height = min_floor_height
-                    floor_area = building_width * building_length
-
-                    if floor_area > total_floor_area:
-                        # Adjust the footprint to meet the FAR requirement
-                        scaling_factor = (total_floor_area / floor_area) ** 0.5
-                        building_width *= scaling_factor
-                        building_length *= scaling_factor
-                        floor_area = building_width * building_length
-
-                    rs.AddBox([(x + (lot_width - building_width) / 2, y + front_yard, current_height),
-                               (x + (lot_width + building_width) / 2, y + front_yard, current_height),
-                               (x + (lot_width + building_width) / 2, y + front_yard + building_length, current_height),
-                               (x + (lot_width - building_width) / 2, y + front_yard + building_length, current_height),
-                               (x + (lot_width - building_width) / 2, y + front_yard, current_height + floor_height),
-                               (x + (lot_width + building_width) / 2, y + front_yard, current_height + floor_height),
-                               (x + (lot_width + building_width) / 2, y + front_yard + building_length, current_height + floor_height),
-                               (x + (lot_width - building_width) / 2, y + front_yard + building_length, current_height + floor_height)])
-                    
-                    current_height += floor_height
+    # Massing style per (row, column); low density is a single-floor building
+    styles = {(0, 0): 'low', (1, 0): 'low', (0, 1): 'pyramid', (1, 1): 'inverted_pyramid', (0, 2): 'tapered', (1, 2): 'tapered'}
+
+    rs.EnableRedraw(False)
+    try:
+        for i in range(2):  # Rows
+            for j in range(3):  # Columns
+                lot_width, lot_length = lot_sizes[j]
+
+                # Calculate the base position for each lot
+                x = start_x + j * (lot_width + spacing_x)
+                y = start_y + i * (lot_length + spacing_y)
+
+                floors = 1 if j == 0 else num_floors
+                plates = solve_massing_cached(styles[(i, j)], lot_width, lot_length, far_limits[j], front_yard,
+                                              rear_yard, side_yard_low, floors, min_floor_height)
+                add_floor_plates(x, y, plates)
+    finally:
+        rs.EnableRedraw(True)
     
 # Run the script
 create_buildings()
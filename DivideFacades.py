@@ -1,17 +1,21 @@
 import rhinoscriptsyntax as rs
 import scriptcontext as sc
 import time
+import math
 import Rhino.Geometry as rg
+from instrumentation import current, start_run
+from mesh_subdivision import refine_to_target, subdivide_faces
 
-def subdivide_curve(curve, new_layer, min_length=1.0):
+def subdivide_curve(curve, new_layer, min_length=1.0, segments=None):
     try:
         curve_length = rs.CurveLength(curve)
         if curve_length < min_length:
             return 0
 
-        segments = 4 if curve_length > 100 else 3 if curve_length > 50 else 2
+        if segments is None:
+            segments = 4 if curve_length > 100 else 3 if curve_length > 50 else 2
         
-        points = [rs.EvaluateCurve(curve, rs.CurveParameter(curve, i / segments)) for i in range(segments + 1)]
+        points = [rs.EvaluateCurve(curve, rs.CurveParameter(curve, float(i) / segments)) for i in range(segments + 1)]
         
         subdivided_curves = []
         for i in range(len(points) - 1):
@@ -29,78 +33,43 @@ def subdivide_curve(curve, new_layer, min_length=1.0):
 
 def subdivide_mesh(mesh_id, new_layer, min_edge_length=1.0):
     try:
-        mesh = rs.coercemesh(mesh_id)
-        if not mesh:
+        vertices, face_indices = mesh_buffers(mesh_id)
+        if vertices is None:
             return 0
 
-        new_mesh = rg.Mesh()
-        vertices = mesh.Vertices.ToPoint3dArray()
-        face_indices = []
-
-        for i in range(mesh.Faces.Count):
-            face = mesh.Faces[i]
-            if face.IsQuad:
-                face_indices.append([face.A, face.B, face.C, face.D])
-            else:
-                face_indices.append([face.A, face.B, face.C])
-
-        new_vertices = list(vertices)
-        new_faces = []
-
-        for face in face_indices:
-            face_vertices = [vertices[i] for i in face]
-            edge_lengths = [face_vertices[i].DistanceTo(face_vertices[(i + 1) % len(face_vertices)]) for i in range(len(face_vertices))]
-            
-            if all(length <= min_edge_length for length in edge_lengths):
-                new_faces.append(face)
-            else:
-                midpoints = []
-                midpoint_indices = []
-                for i in range(len(face_vertices)):
-                    midpoint = face_vertices[i] + (face_vertices[(i + 1) % len(face_vertices)] - face_vertices[i]) * 0.5
-                    if midpoint not in new_vertices:
-                        new_vertices.append(midpoint)
-                    midpoint_indices.append(new_vertices.index(midpoint))
-                    midpoints.append(midpoint)
-                
-                if len(face) == 4:
-                    new_faces.append([face[0], midpoint_indices[0], midpoint_indices[3], face[3]])
-                    new_faces.append([midpoint_indices[0], face[1], midpoint_indices[1], midpoint_indices[3]])
-                    new_faces.append([midpoint_indices[3], midpoint_indices[1], face[2], face[3]])
-                    new_faces.append([midpoint_indices[0], midpoint_indices[1], midpoint_indices[2], midpoint_indices[3]])
-                else:
-                    new_faces.append([face[0], midpoint_indices[0], midpoint_indices[2]])
-                    new_faces.append([midpoint_indices[0], face[1], midpoint_indices[1]])
-                    new_faces.append([midpoint_indices[2], midpoint_indices[1], face[2]])
-                    new_faces.append([midpoint_indices[0], midpoint_indices[1], midpoint_indices[2]])
-
-        new_vertices_f = [rg.Point3f(v.X, v.Y, v.Z) for v in new_vertices]
-        print("Adding {} vertices and {} faces".format(len(new_vertices_f), len(new_faces)))
-        
-        # Debugging: Print types and sample of vertices
-        print("Vertex types and samples:")
-        for i, v in enumerate(new_vertices_f[:5]):
-            print("Type: {}, Value: {}".format(type(v), v))
-
-        for v in new_vertices_f:
-            new_mesh.Vertices.Add(v)
-
-        for f in new_faces:
-            if len(f) == 4:
-                new_mesh.Faces.AddFace(f[0], f[1], f[2], f[3])
-            else:
-                new_mesh.Faces.AddFace(f[0], f[1], f[2])
-
-        new_mesh_id = sc.doc.Objects.AddMesh(new_mesh)
-        if new_mesh_id:
-            rs.ObjectLayer(new_mesh_id, new_layer)
-            rs.DeleteObject(mesh_id)
-            return 1
-        return 0
+        new_vertices, new_faces = subdivide_faces(vertices, face_indices, min_edge_length)
+        run = current()
+        run.count("vertices_emitted", len(new_vertices))
+        run.count("faces_emitted", len(new_faces))
+        return replace_mesh(mesh_id, new_vertices, new_faces, new_layer)
     except Exception as e:
         print("Error in subdivide_mesh: {}".format(e))
         return -1
 
+def mesh_buffers(mesh_id):
+    mesh = rs.coercemesh(mesh_id)
+    if not mesh:
+        return None, None
+    vertices = [(v.X, v.Y, v.Z) for v in mesh.Vertices]
+    faces = []
+    for i in range(mesh.Faces.Count):
+        face = mesh.Faces[i]
+        faces.append((face.A, face.B, face.C, face.D) if face.IsQuad else (face.A, face.B, face.C))
+    return vertices, faces
+
+def replace_mesh(mesh_id, vertices, faces, new_layer):
+    # Hand the whole vertex and face buffers to the mesh in one call each
+    new_mesh = rg.Mesh()
+    new_mesh.Vertices.AddVertices([rg.Point3f(x, y, z) for x, y, z in vertices])
+    new_mesh.Faces.AddFaces([rg.MeshFace(*f) for f in faces])
+
+    new_mesh_id = sc.doc.Objects.AddMesh(new_mesh)
+    if new_mesh_id:
+        rs.ObjectLayer(new_mesh_id, new_layer)
+        rs.DeleteObject(mesh_id)
+        return 1
+    return 0
+
 def get_object_details(obj):
     details = []
     details.append("GUID: {}".format(obj))
@@ -138,6 +107,8 @@ def divide_all_facades(layer_name, min_curve_length=1.0, min_edge_length=1.0):
 
     chunk_size = 50
     
+    run = current()
+    progress = run.progress("Dividing facades", total_objects)
     rs.EnableRedraw(False)
     
     total_subdivisions = 0
@@ -147,41 +118,116 @@ def divide_all_facades(layer_name, min_curve_length=1.0, min_edge_length=1.0):
     
     start_time = time.time()
     
-    for i in range(0, total_objects, chunk_size):
-        chunk = objects[i:i + chunk_size]
-        for obj in chunk:
-            if rs.IsCurve(obj):
-                curve_processed_count += 1
-                subdivisions_count = subdivide_curve(obj, new_layer, min_length=min_curve_length)
-                if subdivisions_count == -1:
-                    print("Terminating script due to error in subdivide_curve.")
-                    return
-                total_subdivisions += subdivisions_count
-            elif rs.IsMesh(obj):
-                mesh_processed_count += 1
-                subdivisions_count = subdivide_mesh(obj, new_layer, min_edge_length=min_edge_length)
-                if subdivisions_count == -1:
-                    print("Error encountered. Skipping problematic mesh.")
-                    continue  # Skip the problematic mesh and continue processing
-                total_subdivisions += subdivisions_count
+    with run.span("subdivide"):
+        for i in range(0, total_objects, chunk_size):
+            chunk = objects[i:i + chunk_size]
+            for obj in chunk:
+                if rs.IsCurve(obj):
+                    curve_processed_count += 1
+                    subdivisions_count = subdivide_curve(obj, new_layer, min_length=min_curve_length)
+                    if subdivisions_count == -1:
+                        print("Terminating script due to error in subdivide_curve.")
+                        return
+                    total_subdivisions += subdivisions_count
+                elif rs.IsMesh(obj):
+                    mesh_processed_count += 1
+                    subdivisions_count = subdivide_mesh(obj, new_layer, min_edge_length=min_edge_length)
+                    if subdivisions_count == -1:
+                        print("Error encountered. Skipping problematic mesh.")
+                        continue  # Skip the problematic mesh and continue processing
+                    total_subdivisions += subdivisions_count
         
-        processed_objects += len(chunk)
-        rs.EnableRedraw(True)
-        sc.doc.Views.Redraw()
-        rs.EnableRedraw(False)
-        sc.escape_test(False)
+            processed_objects += len(chunk)
+            progress.update(len(chunk))
+            rs.EnableRedraw(True)
+            sc.doc.Views.Redraw()
+            rs.EnableRedraw(False)
+            sc.escape_test(False)
     
     end_time = time.time()
     processing_time = end_time - start_time
     
     rs.EnableRedraw(True)
+    run.count("curves_processed", curve_processed_count)
+    run.count("meshes_processed", mesh_processed_count)
+    run.count("objects_created", total_subdivisions)
     print("\nFinal Report:\nProcessed {} objects: {} curves, {} meshes".format(total_objects, curve_processed_count, mesh_processed_count))
     print("Created {} subdivided objects on layer '{}'".format(total_subdivisions, new_layer))
     print("Processing time: {:.2f} seconds".format(processing_time))
 
+def divide_all_facades_adaptive(layer_name, target_edge_length=None, target_area=None, max_levels=6, confirm=True):
+    """Refine every facade on the layer in memory until it meets the target panel size, then write once.
+
+    Meshes are refined conformingly (see mesh_subdivision.refine_to_target) and
+    curves are split into equal segments no longer than target_edge_length, both
+    capped at max_levels halvings. The final face count is reported before
+    anything is written so the output size can be checked first.
+    """
+    objects = rs.ObjectsByLayer(layer_name)
+    if not objects:
+        print("No objects found on the layer {}. Exiting.".format(layer_name))
+        return
+
+    new_layer = "{}_Subdivided".format(layer_name)
+    start_time = time.time()
+    run = current()
+    progress = run.progress("Refining facades", len(objects))
+
+    refined_meshes = []
+    curve_segments = []
+    face_count = 0
+    max_levels_used = 0
+    with run.span("refine"):
+        for obj in objects:
+            progress.update()
+            if rs.IsMesh(obj):
+                vertices, faces = mesh_buffers(obj)
+                if vertices is None:
+                    continue
+                vertices, faces, levels = refine_to_target(vertices, faces, target_edge_length, target_area, max_levels)
+                refined_meshes.append((obj, vertices, faces))
+                face_count += len(faces)
+                max_levels_used = max(max_levels_used, levels)
+                run.count("meshes_processed")
+            elif rs.IsCurve(obj) and target_edge_length:
+                segments = int(math.ceil(rs.CurveLength(obj) / target_edge_length))
+                curve_segments.append((obj, min(max(segments, 1), 2 ** max_levels)))
+                run.count("curves_processed")
+            sc.escape_test(False)
+
+    segment_count = sum(segments for _, segments in curve_segments)
+    print("\nRefinement Preview:\nMeshes: {} -> {} faces (up to {} levels)\nCurves: {} -> {} segments".format(
+        len(refined_meshes), face_count, max_levels_used, len(curve_segments), segment_count))
+    print("Refinement time: {:.2f} seconds".format(time.time() - start_time))
+
+    if confirm and rs.GetString("Write {} faces and {} segments?".format(face_count, segment_count), "Yes", ["Yes", "No"]) != "Yes":
+        print("Nothing written.")
+        return
+
+    if not rs.IsLayer(new_layer):
+        rs.AddLayer(new_layer)
+    rs.EnableRedraw(False)
+    try:
+        with run.span("write"):
+            for obj, vertices, faces in refined_meshes:
+                replace_mesh(obj, vertices, faces, new_layer)
+            for obj, segments in curve_segments:
+                subdivide_curve(obj, new_layer, min_length=0.0, segments=segments)
+    finally:
+        rs.EnableRedraw(True)
+    run.count("faces_emitted", face_count)
+    run.count("segments_emitted", segment_count)
+    print("Created {} faces and {} segments on layer '{}'".format(face_count, segment_count, new_layer))
+    print("Processing time: {:.2f} seconds".format(time.time() - start_time))
+
 if __name__ == "__main__":
     layer_name = rs.GetString("Enter the name of the layer containing facades to subdivide", rs.CurrentLayer())
     if layer_name and rs.IsLayer(layer_name):
-        divide_all_facades(layer_name)
+        target_edge_length = rs.GetReal("Target panel edge length (0 for a single split)", 0.0, 0.0)
+        with start_run("DivideFacades"):
+            if target_edge_length:
+                divide_all_facades_adaptive(layer_name, target_edge_length=target_edge_length)
+            else:
+                divide_all_facades(layer_name)
     else:
         print("Invalid layer name. Exiting.")
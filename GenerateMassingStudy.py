@@ -0,0 +1,53 @@
+import rhinoscriptsyntax as rs
+import scriptcontext as sc
+import Rhino
+import System
+import time
+
+from massing import generate_massing, far_report, read_lot_table
+
+
+def add_massing_to_document(lots, plates, massing_layer="Massing", lot_layer="Lots"):
+    """Add every floor plate as a box and every lot as an outline in one undoable step with redraw off."""
+    for layer in (massing_layer, lot_layer):
+        if not rs.IsLayer(layer):
+            rs.AddLayer(layer)
+    massing_attributes = Rhino.DocObjects.ObjectAttributes()
+    massing_attributes.LayerIndex = sc.doc.Layers.FindByFullPath(massing_layer, -1)
+    lot_attributes = Rhino.DocObjects.ObjectAttributes()
+    lot_attributes.LayerIndex = sc.doc.Layers.FindByFullPath(lot_layer, -1)
+
+    added_count = 0
+    rs.EnableRedraw(False)
+    undo_record = sc.doc.BeginUndoRecord("Generate massing study")
+    try:
+        for lot in lots:
+            x, y = lot['x'], lot['y']
+            outline = Rhino.Geometry.Polyline([
+                Rhino.Geometry.Point3d(x, y, 0), Rhino.Geometry.Point3d(x + lot['width'], y, 0),
+                Rhino.Geometry.Point3d(x + lot['width'], y + lot['length'], 0), Rhino.Geometry.Point3d(x, y + lot['length'], 0),
+                Rhino.Geometry.Point3d(x, y, 0)])
+            sc.doc.Objects.AddPolyline(outline, lot_attributes)
+        for low, high in plates.corners():
+            box = Rhino.Geometry.Box(Rhino.Geometry.BoundingBox(Rhino.Geometry.Point3d(*low), Rhino.Geometry.Point3d(*high)))
+            if sc.doc.Objects.AddBox(box, massing_attributes) != System.Guid.Empty:
+                added_count += 1
+    finally:
+        sc.doc.EndUndoRecord(undo_record)
+        rs.EnableRedraw(True)
+    return added_count
+
+
+if __name__ == "__main__":
+    table_path = rs.OpenFileName("Select lot and zoning table", "CSV Files (*.csv)|*.csv||")
+    if table_path:
+        start_time = time.time()
+        lots = read_lot_table(table_path)
+        plates, report = generate_massing(lots)
+        solve_time = time.time() - start_time
+        added_count = add_massing_to_document(lots, plates)
+        print(far_report(report))
+        print("\nFinal Report:")
+        print("Generated {0} floor plates for {1} lots".format(added_count, len(lots)))
+        print("Solve time: {0:.2f} seconds".format(solve_time))
+        print("Processing time: {0:.2f} seconds".format(time.time() - start_time))
@@ -0,0 +1,201 @@
+"""Uniform-grid spatial index over 2D object bounding boxes.
+
+Pure Python with array('d')/array('l') storage so it runs in IronPython inside
+Rhino; the index, including its grid cells, is persisted next to the .3dm file
+and reused as long as the file's size and modification time match.
+"""
+import json
+import math
+import os
+from array import array
+
+INDEX_SUFFIX = ".bboxindex"
+
+
+def file_signature(path):
+    """Size and modification time of path; cheap to check even on multi-GB models."""
+    stat = os.stat(path)
+    return "{0}:{1!r}".format(stat.st_size, stat.st_mtime)
+
+
+def _point_in_polygon(x, y, polygon):
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _segments_cross(p1, p2, q1, q2):
+    def orient(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    d1, d2 = orient(q1, q2, p1), orient(q1, q2, p2)
+    d3, d4 = orient(p1, p2, q1), orient(p1, p2, q2)
+    return (d1 * d2 <= 0) and (d3 * d4 <= 0)
+
+
+def box_intersects_polygon(box, polygon):
+    """True if the axis-aligned box (min_x, min_y, max_x, max_y) overlaps the polygon."""
+    min_x, min_y, max_x, max_y = box
+    if any(min_x <= x <= max_x and min_y <= y <= max_y for x, y in polygon):
+        return True
+    corners = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+    if _point_in_polygon(corners[0][0], corners[0][1], polygon):
+        return True
+    for i in range(len(polygon)):
+        a, b = polygon[i], polygon[(i + 1) % len(polygon)]
+        for k in range(4):
+            if _segments_cross(a, b, corners[k], corners[(k + 1) % 4]):
+                return True
+    return False
+
+
+class BoundingBoxIndex(object):
+    """Object bounding boxes bucketed into a uniform grid of square cells.
+
+    Boxes are stored flat as (min_x, min_y, max_x, max_y) in one array('d');
+    cell membership is stored CSR-style, with cell c owning
+    items[starts[c]:starts[c + 1]].
+    """
+
+    def __init__(self, ids, boxes, cell_size=None, source_signature=None):
+        self.ids = list(ids)
+        self.boxes = array('d')
+        for box in boxes:
+            self.boxes.extend(box)
+        self.source_signature = source_signature
+        self._set_grid(cell_size)
+        self._build_cells()
+
+    def _set_grid(self, cell_size=None):
+        n = len(self.ids)
+        if n:
+            self.origin = (min(self.boxes[0::4]), min(self.boxes[1::4]))
+            extent_x = max(self.boxes[2::4]) - self.origin[0]
+            extent_y = max(self.boxes[3::4]) - self.origin[1]
+        else:
+            self.origin, extent_x, extent_y = (0.0, 0.0), 0.0, 0.0
+        if cell_size is None:
+            # About one object per cell on average, but never smaller than a typical box
+            mean_size = sum(max(self.boxes[4 * i + 2] - self.boxes[4 * i], self.boxes[4 * i + 3] - self.boxes[4 * i + 1])
+                            for i in range(n)) / float(n) if n else 1.0
+            cell_size = max(math.sqrt(extent_x * extent_y / float(n)) if n else 1.0, mean_size, 1e-9)
+        self.cell_size = cell_size
+        self.columns = int(extent_x / cell_size) + 1
+        self.rows = int(extent_y / cell_size) + 1
+
+    def _cell_range(self, min_x, min_y, max_x, max_y):
+        c0 = min(max(int((min_x - self.origin[0]) / self.cell_size), 0), self.columns - 1)
+        c1 = min(max(int((max_x - self.origin[0]) / self.cell_size), 0), self.columns - 1)
+        r0 = min(max(int((min_y - self.origin[1]) / self.cell_size), 0), self.rows - 1)
+        r1 = min(max(int((max_y - self.origin[1]) / self.cell_size), 0), self.rows - 1)
+        return c0, c1, r0, r1
+
+    def _build_cells(self):
+        counts = array('l', [0] * (self.columns * self.rows + 1))
+        for i in range(len(self.ids)):
+            c0, c1, r0, r1 = self._cell_range(*self.boxes[4 * i:4 * i + 4])
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    counts[r * self.columns + c + 1] += 1
+        for k in range(1, len(counts)):
+            counts[k] += counts[k - 1]
+        self.starts = counts
+        self.items = array('l', [0] * counts[-1])
+        fill = array('l', counts[:-1])
+        for i in range(len(self.ids)):
+            c0, c1, r0, r1 = self._cell_range(*self.boxes[4 * i:4 * i + 4])
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    cell = r * self.columns + c
+                    self.items[fill[cell]] = i
+                    fill[cell] += 1
+
+    def _candidates(self, min_x, min_y, max_x, max_y):
+        c0, c1, r0, r1 = self._cell_range(min_x, min_y, max_x, max_y)
+        seen = set()
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                cell = r * self.columns + c
+                seen.update(self.items[self.starts[cell]:self.starts[cell + 1]])
+        return sorted(seen)
+
+    def query_box(self, min_x, min_y, max_x, max_y):
+        """Ids of objects whose bounding box intersects the query box."""
+        if not self.ids:
+            return []
+        b = self.boxes
+        return [self.ids[i] for i in self._candidates(min_x, min_y, max_x, max_y)
+                if b[4 * i] <= max_x and b[4 * i + 2] >= min_x and b[4 * i + 1] <= max_y and b[4 * i + 3] >= min_y]
+
+    def query_polygon(self, polygon):
+        """Ids of objects whose bounding box intersects an arbitrary (x, y) polygon."""
+        if not self.ids:
+            return []
+        polygon = [(float(x), float(y)) for x, y in polygon]
+        xs = [x for x, _ in polygon]
+        ys = [y for _, y in polygon]
+        b = self.boxes
+        return [self.ids[i] for i in self._candidates(min(xs), min(ys), max(xs), max(ys))
+                if box_intersects_polygon(b[4 * i:4 * i + 4], polygon)]
+
+    def save(self, path):
+        ids_blob = "\n".join(str(i) for i in self.ids).encode('utf-8')
+        header = {
+            'source_signature': self.source_signature, 'count': len(self.ids), 'cell_size': self.cell_size,
+            'ids_bytes': len(ids_blob), 'item_size': self.items.itemsize, 'items': len(self.items),
+        }
+        with open(path, 'wb') as f:
+            f.write((json.dumps(header) + "\n").encode('utf-8'))
+            f.write(ids_blob)
+            self.boxes.tofile(f)
+            self.starts.tofile(f)
+            self.items.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Index saved by save; the grid cells are read back rather than rebuilt."""
+        index = cls.__new__(cls)
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline().decode('utf-8'))
+            ids_blob = f.read(header['ids_bytes']).decode('utf-8')
+            index.ids = ids_blob.split("\n") if header['count'] else []
+            index.boxes = array('d')
+            index.boxes.fromfile(f, 4 * header['count'])
+            index.source_signature = header['source_signature']
+            index._set_grid(header['cell_size'])
+            index.starts = array('l')
+            index.items = array('l')
+            if header['item_size'] != index.items.itemsize:
+                # Written by an interpreter with a different C long size
+                index._build_cells()
+                return index
+            index.starts.fromfile(f, index.columns * index.rows + 1)
+            index.items.fromfile(f, header['items'])
+        return index
+
+
+def load_or_build(document_path, collect_boxes):
+    """Index for document_path, loaded from disk if the file is unchanged, else rebuilt and saved.
+
+    The file counts as unchanged while its size and modification time match.
+    collect_boxes() must return (ids, boxes) for the objects as saved in the
+    file, so callers should not use this for a document with unsaved changes.
+    """
+    index_path = document_path + INDEX_SUFFIX
+    signature = file_signature(document_path)
+    if os.path.exists(index_path):
+        try:
+            index = BoundingBoxIndex.load(index_path)
+            if index.source_signature == signature:
+                return index
+        except (IOError, OSError, ValueError, KeyError, EOFError):
+            pass  # unreadable or stale; rebuild below
+    ids, boxes = collect_boxes()
+    index = BoundingBoxIndex(ids, boxes, source_signature=signature)
+    index.save(index_path)
+    return index
@@ -0,0 +1,130 @@
+"""Lookup-table colormaps shared by the coloring scripts.
+
+Runs in IronPython (plain lists) and CPython; when NumPy is available, arrays
+of values are mapped to colors in a single vectorized call.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Control points as (position, (r, g, b)) with channels in [0, 1]
+SPECTRAL = [
+    (0.0, (0.6, 0.0, 0.0)),  # Dark Red
+    (0.25, (0.9, 0.4, 0.0)),  # Orange
+    (0.5, (1.0, 1.0, 0.2)),  # Yellow
+    (0.75, (0.0, 0.6, 1.0)),  # Light Blue
+    (1.0, (0.0, 0.0, 0.4))  # Dark Blue
+]
+
+VIRIDIS = [
+    (0.0, (0.267, 0.005, 0.329)),
+    (0.25, (0.229, 0.322, 0.546)),
+    (0.5, (0.128, 0.567, 0.551)),
+    (0.75, (0.369, 0.789, 0.383)),
+    (1.0, (0.993, 0.906, 0.144))
+]
+
+
+def _interpolate(control_points, t):
+    for i in range(len(control_points) - 1):
+        t1, c1 = control_points[i]
+        t2, c2 = control_points[i + 1]
+        if t1 <= t <= t2:
+            f = (t - t1) / (t2 - t1)
+            return tuple(int((a * (1 - f) + b * f) * 255) for a, b in zip(c1, c2))
+    return tuple(int(c * 255) for c in control_points[-1][1])
+
+
+def normalize(values, method='minmax'):
+    """Map values to [0, 1] by 'minmax', 'log' (min/max of the logarithm) or 'quantile' (rank).
+
+    Tied values share their average rank, so equal values get equal colors and
+    constant inputs map to 0.5. Log normalization clamps non-positive values to
+    the smallest positive one.
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        values = values.astype(float)
+        if method == 'quantile':
+            _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+            ranks = (np.cumsum(counts) - counts + (counts - 1) / 2.0)[inverse.reshape(-1)]
+            return ranks / (len(values) - 1) if len(values) > 1 else np.full(len(values), 0.5)
+        if method == 'log':
+            positive = values[values > 0]
+            values = np.log(np.maximum(values, positive.min() if positive.size else 1.0))
+        elif method != 'minmax':
+            raise ValueError("Unknown normalization: {0}".format(method))
+        low, high = (values.min(), values.max()) if values.size else (0.0, 0.0)
+        return (values - low) / (high - low) if high != low else np.full(len(values), 0.5)
+
+    values = [float(v) for v in values]
+    if method == 'quantile':
+        ranks = [0.0] * len(values)
+        order = sorted(range(len(values)), key=lambda i: values[i])
+        start = 0
+        while start < len(order):
+            stop = start + 1
+            while stop < len(order) and values[order[stop]] == values[order[start]]:
+                stop += 1
+            for i in order[start:stop]:
+                ranks[i] = (start + stop - 1) / 2.0
+            start = stop
+        return [r / (len(values) - 1) for r in ranks] if len(values) > 1 else [0.5] * len(values)
+    if method == 'log':
+        positive = [v for v in values if v > 0]
+        floor = min(positive) if positive else 1.0
+        values = [math.log(max(v, floor)) for v in values]
+    elif method != 'minmax':
+        raise ValueError("Unknown normalization: {0}".format(method))
+    low, high = (min(values), max(values)) if values else (0.0, 0.0)
+    return [(v - low) / (high - low) for v in values] if high != low else [0.5] * len(values)
+
+
+class LookupColormap(object):
+    """Colormap precomputed into a fixed number of bins.
+
+    color_factory turns (r, g, b) bytes into the caller's color type, e.g.
+    System.Drawing.Color.FromArgb in Rhino; one object is created per bin and
+    reused for every value that falls into it.
+    """
+
+    def __init__(self, control_points=SPECTRAL, size=256, color_factory=None):
+        self.size = size
+        self.rgb = [_interpolate(control_points, i / float(size - 1)) for i in range(size)]
+        self.color_factory = color_factory
+        self._colors = [None] * size
+        self._rgb_array = np.array(self.rgb, dtype=np.uint8) if np is not None else None
+
+    def bin(self, t):
+        return min(max(int(t * (self.size - 1) + 0.5), 0), self.size - 1)
+
+    def color(self, t):
+        """Color object for a normalized value, created once per bin."""
+        index = self.bin(t)
+        color = self._colors[index]
+        if color is None:
+            r, g, b = self.rgb[index]
+            color = self.color_factory(r, g, b) if self.color_factory else (r, g, b)
+            self._colors[index] = color
+        return color
+
+    def colors(self, values, method='minmax'):
+        """Color objects for raw values after normalization."""
+        return [self.color(t) for t in normalize(values, method)]
+
+    def rgb_array(self, values, method='minmax', value_range=None):
+        """(N, 3) uint8 colors for a NumPy array of raw values in one vectorized lookup.
+
+        value_range, a (low, high) pair, replaces normalization so chunks of one
+        dataset share a scale; values outside it are clamped.
+        """
+        if value_range is not None:
+            low, high = value_range
+            values = np.asarray(values, dtype=float)
+            t = (values - low) / (high - low) if high != low else np.full(len(values), 0.5)
+        else:
+            t = normalize(np.asarray(values), method)
+        bins = np.clip(np.floor(t * (self.size - 1) + 0.5).astype(int), 0, self.size - 1)
+        return self._rgb_array[bins]
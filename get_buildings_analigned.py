@@ -1,41 +1,63 @@
 import rhinoscriptsyntax as rs
+import scriptcontext as sc
 import Rhino.Geometry as rg
 
-def extract_buildings_within_bounding_box_and_save():
-    # Define the bounding box coordinates
-    min_x = min(1026747.722, 1026944.545, 1027687.389, 1027465.610)
-    max_x = max(1026747.722, 1026944.545, 1027687.389, 1027465.610)
-    min_y = min(189233.367, 188605.482, 188896.548, 189497.249)
-    max_y = max(189233.367, 188605.482, 188896.548, 189497.249)
+from bbox_index import BoundingBoxIndex, load_or_build
 
-    # Get all objects from the relevant layers
-    all_objects = rs.ObjectsByLayer("Building_Facade") + rs.ObjectsByLayer("Building_FootPrint")
-    
-    # Filter objects within the bounding box
-    filtered_objects = []
-    for obj in all_objects:
-        bbox = rs.BoundingBox(obj)
-        if bbox:
-            obj_min_x = min(point.X for point in bbox)
-            obj_max_x = max(point.X for point in bbox)
-            obj_min_y = min(point.Y for point in bbox)
-            obj_max_y = max(point.Y for point in bbox)
-            
-            # Check if object's bounding box intersects with our bounding box
-            if (obj_min_x <= max_x and obj_max_x >= min_x and
-                obj_min_y <= max_y and obj_max_y >= min_y):
-                filtered_objects.append(obj)
+BUILDING_LAYERS = ("Building_Facade", "Building_FootPrint")
+
+# Corners of the default study area, a rotated rectangle in drawing order
+DEFAULT_REGION = [
+    (1026747.722, 189233.367),
+    (1026944.545, 188605.482),
+    (1027687.389, 188896.548),
+    (1027465.610, 189497.249)
+]
+
+
+def collect_building_boxes():
+    """Ids and (min_x, min_y, max_x, max_y) boxes of every object on the building layers."""
+    ids = []
+    boxes = []
+    for layer in BUILDING_LAYERS:
+        for obj in rs.ObjectsByLayer(layer) or []:
+            bbox = sc.doc.Objects.FindId(obj).Geometry.GetBoundingBox(False)
+            if bbox.IsValid:
+                ids.append(str(obj))
+                boxes.append((bbox.Min.X, bbox.Min.Y, bbox.Max.X, bbox.Max.Y))
+    return ids, boxes
+
+
+def building_index():
+    """Bounding-box index of the building layers, reused from beside the saved .3dm when unchanged.
+
+    A document with unsaved changes no longer matches its file, so it is
+    indexed from memory and nothing is persisted.
+    """
+    if sc.doc.Path and not sc.doc.Modified:
+        return load_or_build(sc.doc.Path, collect_building_boxes)
+    ids, boxes = collect_building_boxes()
+    return BoundingBoxIndex(ids, boxes)
+
+
+def extract_buildings_within_bounding_box_and_save(region=None):
+    """Select and export building objects whose bounding box intersects region, a list of (x, y) points."""
+    region = region or DEFAULT_REGION
+    index = building_index()
+
+    # Ids from a persisted index may refer to objects deleted since the file was saved
+    filtered_objects = [obj for obj in index.query_polygon(region) if rs.IsObject(obj)]
     
     # Check if any objects were found
     if not filtered_objects:
-        print("No Building_Facade or Building_FootPrint objects found within the bounding box.")
+        print("No Building_Facade or Building_FootPrint objects found within the region.")
         return
     
     # Select the filtered objects
     rs.SelectObjects(filtered_objects)
     
     # Report results
-    print("Selected {} objects within the specified bounding box.".format(len(filtered_objects)))
+    print("Selected {} objects within the specified region.".format(len(filtered_objects)))
     
     # Save selected objects to a new file
     save_path = rs.SaveFileName("Save selected objects", "Rhino 3D Models (*.3dm)|*.3dm")
@@ -48,4 +70,8 @@ def extract_buildings_within_bounding_box_and_save():
 
 # Run the main function
 if __name__ == "__main__":
-    extract_buildings_within_bounding_box_and_save()
+    region_curve = rs.GetObject("Select a closed region curve (Enter for the default study area)", rs.filter.curve)
+    region = None
+    if region_curve and rs.IsCurveClosed(region_curve):
+        region = [(p.X, p.Y) for p in rs.CurvePoints(region_curve)]
+    extract_buildings_within_bounding_box_and_save(region)
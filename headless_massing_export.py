@@ -0,0 +1,50 @@
+"""Headless export of a lot massing study to .3dm through rhino3dm.
+
+Solves a lot and zoning table with massing.generate_massing and writes the lot
+outlines and floor-plate boxes to a new .3dm file, without a Rhino UI.
+"""
+import argparse
+import time
+
+import rhino3dm as rg
+
+from massing import generate_massing, far_report, read_lot_table
+
+
+def write_massing_3dm(lots, plates, output_path, massing_layer="Massing", lot_layer="Lots"):
+    """Write lot outlines and floor-plate boxes to output_path on two layers."""
+    model = rg.File3dm()
+    layer_indices = []
+    for name in (massing_layer, lot_layer):
+        layer = rg.Layer()
+        layer.Name = name
+        layer_indices.append(model.Layers.Add(layer))
+    massing_attributes = rg.ObjectAttributes()
+    massing_attributes.LayerIndex = layer_indices[0]
+    lot_attributes = rg.ObjectAttributes()
+    lot_attributes.LayerIndex = layer_indices[1]
+
+    for lot in lots:
+        x, y = lot['x'], lot['y']
+        corners = [(x, y), (x + lot['width'], y), (x + lot['width'], y + lot['length']), (x, y + lot['length']), (x, y)]
+        model.Objects.AddPolyline([rg.Point3d(px, py, 0) for px, py in corners], lot_attributes)
+    for low, high in plates.corners():
+        box = rg.BoundingBox(rg.Point3d(*low), rg.Point3d(*high))
+        model.Objects.AddBrep(rg.Brep.CreateFromBox(rg.Box(box)), massing_attributes)
+    model.Write(output_path, 7)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a lot massing study from a CSV table, without Rhino.")
+    parser.add_argument("table")
+    parser.add_argument("output")
+    parser.add_argument("--spacing", type=float, default=20.0)
+    args = parser.parse_args()
+    start_time = time.time()
+    lots = read_lot_table(args.table)
+    plates, report = generate_massing(lots, args.spacing)
+    write_massing_3dm(lots, plates, args.output)
+    print(far_report(report))
+    print("\nFinal Report:")
+    print("Wrote {0} floor plates for {1} lots to {2}".format(len(plates), len(lots), args.output))
+    print("Processing time: {0:.2f} seconds".format(time.time() - start_time))
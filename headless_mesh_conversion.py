@@ -0,0 +1,79 @@
+"""Headless surface-to-mesh conversion of .3dm files through rhino3dm.
+
+Runs without a Rhino UI, e.g. on Linux render nodes. rhino3dm has no meshing
+kernel, so surfaces are replaced by the render meshes cached in the file
+(saved whenever the model was shaded in Rhino); surfaces without a cached mesh
+are kept as they are and counted in the report.
+"""
+import argparse
+import time
+
+import rhino3dm as rg
+
+
+def cached_meshes(geometry):
+    """Render meshes stored with a brep, extrusion or surface, one per face."""
+    if isinstance(geometry, rg.Extrusion):
+        mesh = geometry.GetMesh(rg.MeshType.Any)
+        return [mesh] if mesh is not None else []
+    if isinstance(geometry, rg.Surface):
+        geometry = geometry.ToBrep()
+    if isinstance(geometry, rg.Brep):
+        meshes = [face.GetMesh(rg.MeshType.Any) for face in geometry.Faces]
+        return meshes if meshes and all(mesh is not None for mesh in meshes) else []
+    return []
+
+
+def convert_3dm_surfaces_to_meshes(source_path, output_path, layer_name, new_layer=None):
+    """Write a copy of source_path where surfaces on layer_name are replaced by meshes on new_layer."""
+    new_layer = new_layer or layer_name + "_Meshes"
+    start_time = time.time()
+    model = rg.File3dm.Read(source_path)
+    if model is None:
+        raise Exception(f"Could not read {source_path}")
+
+    output = rg.File3dm()
+    layer_indices = {}
+    for index, layer in enumerate(model.Layers):
+        layer_indices[index] = output.Layers.Add(layer)
+    source_layer = next((i for i, layer in enumerate(model.Layers) if layer.Name == layer_name), None)
+    if source_layer is None:
+        raise Exception(f"No layer named '{layer_name}' in {source_path}")
+    mesh_layer = rg.Layer()
+    mesh_layer.Name = new_layer
+    mesh_layer_index = output.Layers.Add(mesh_layer)
+
+    surface_count = converted_count = skipped_count = 0
+    for obj in model.Objects:
+        attributes = obj.Attributes
+        geometry = obj.Geometry
+        on_source_layer = attributes.LayerIndex == source_layer
+        attributes.LayerIndex = layer_indices.get(attributes.LayerIndex, attributes.LayerIndex)
+        if on_source_layer and isinstance(geometry, (rg.Brep, rg.Extrusion, rg.Surface)):
+            surface_count += 1
+            meshes = cached_meshes(geometry)
+            if meshes:
+                attributes.LayerIndex = mesh_layer_index
+                for mesh in meshes:
+                    output.Objects.AddMesh(mesh, attributes)
+                    converted_count += 1
+                continue
+            skipped_count += 1
+        output.Objects.Add(geometry, attributes)
+
+    output.Write(output_path, 7)
+    print("\nFinal Report:")
+    print("Processed {0} surfaces".format(surface_count))
+    print("Converted {0} surfaces to meshes on layer '{1}'".format(converted_count, new_layer))
+    print("Kept {0} surfaces without a cached render mesh".format(skipped_count))
+    print("Processing time: {0:.2f} seconds".format(time.time() - start_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replace surfaces on a layer of a .3dm file with meshes, without Rhino.")
+    parser.add_argument("source")
+    parser.add_argument("output")
+    parser.add_argument("layer")
+    parser.add_argument("--new-layer")
+    args = parser.parse_args()
+    convert_3dm_surfaces_to_meshes(args.source, args.output, args.layer, args.new_layer)
@@ -0,0 +1,145 @@
+"""Headless spatial tiling of a city .3dm file through rhino3dm.
+
+Reads the source model once, bins every object by the centroid of its bounding
+box into a grid of square tiles, and writes one .3dm per non-empty tile with
+the full layer, material, linetype and block (instance definition) tables
+preserved, so attribute indices and block references resolve in every tile.
+An overlap margin also places objects whose centroid lies within that distance
+of a neighbouring tile into it, so shadow-casting neighbours are present at
+tile borders.
+"""
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import rhino3dm as rg
+
+
+def tile_keys(x, y, origin, tile_size, margin=0.0):
+    """(column, row) of every tile whose extent, grown by margin, contains the point (x, y)."""
+    c0 = int(math.floor((x - margin - origin[0]) / tile_size))
+    c1 = int(math.floor((x + margin - origin[0]) / tile_size))
+    r0 = int(math.floor((y - margin - origin[1]) / tile_size))
+    r1 = int(math.floor((y + margin - origin[1]) / tile_size))
+    return [(c, r) for c in range(c0, c1 + 1) for r in range(r0, r1 + 1)]
+
+
+def definition_boxes(model):
+    """{instance definition id: bounding box of its member geometry}, for placing block references."""
+    members = dict((str(obj.Attributes.Id), obj) for obj in model.Objects if obj.Attributes.IsInstanceDefinitionObject)
+    boxes = {}
+    for idef in model.InstanceDefinitions:
+        box = None
+        for object_id in idef.GetObjectIds():
+            member = members.get(str(object_id))
+            member_box = member.Geometry.GetBoundingBox() if member is not None else None
+            if member_box is not None and member_box.IsValid:
+                box = member_box if box is None else rg.BoundingBox.Union(box, member_box)
+        if box is not None:
+            boxes[str(idef.Id)] = box
+    return boxes
+
+
+def object_box(obj, idef_boxes):
+    """Bounding box of an object; a block reference uses its definition's box, transformed."""
+    geometry = obj.Geometry
+    if isinstance(geometry, rg.InstanceReference):
+        box = idef_boxes.get(str(geometry.ParentIdefId))
+        if box is None:
+            return rg.BoundingBox(1, 0, 0, -1, 0, 0)  # invalid: empty or nested-only definition
+        box = rg.BoundingBox(box.Min, box.Max)
+        box.Transform(geometry.Xform)
+        return box
+    return geometry.GetBoundingBox()
+
+
+def tile_template(source_bytes):
+    """Bytes of the source model with every object removed except block member geometry.
+
+    Every tile starts as a copy of this template, so the layer, material,
+    linetype, block (instance definition) and other tables carry over with
+    their indices and ids unchanged. Copying them table by table is not an
+    option: rhino3dm's linetype wrappers crash when a model holding them is freed.
+    """
+    template = rg.File3dm.FromByteArray(source_bytes)
+    object_ids = [obj.Attributes.Id for obj in template.Objects if not obj.Attributes.IsInstanceDefinitionObject]
+    for object_id in object_ids:
+        template.Objects.Delete(object_id)
+    fd, path = tempfile.mkstemp(suffix=".3dm")
+    os.close(fd)
+    try:
+        template.Write(path, 7)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def tile_3dm(source_path, output_dir, tile_size, margin=0.0, origin=None):
+    """Split source_path into tiles of tile_size model units written to output_dir.
+
+    origin defaults to the lower-left corner of the model's tile grid, aligned to
+    multiples of tile_size. Returns {(column, row): output_path}.
+    """
+    if tile_size <= 0 or margin < 0:
+        raise ValueError("tile_size must be positive and margin non-negative")
+    start_time = time.time()
+    with open(source_path, 'rb') as f:
+        source_bytes = f.read()
+    model = rg.File3dm.FromByteArray(source_bytes)
+    if model is None:
+        raise Exception(f"Could not read {source_path}")
+
+    idef_boxes = definition_boxes(model)
+    centroids = []
+    skipped_count = 0
+    for obj in model.Objects:
+        if obj.Attributes.IsInstanceDefinitionObject:
+            continue  # block member geometry travels with its definition
+        bbox = object_box(obj, idef_boxes)
+        if not bbox.IsValid:
+            skipped_count += 1
+            continue
+        centroids.append((obj, (bbox.Min.X + bbox.Max.X) / 2.0, (bbox.Min.Y + bbox.Max.Y) / 2.0))
+    if origin is None:
+        origin = (0.0, 0.0)
+        if centroids:
+            origin = (math.floor(min(x for _, x, _ in centroids) / tile_size) * tile_size,
+                      math.floor(min(y for _, _, y in centroids) / tile_size) * tile_size)
+
+    tiles = {}
+    for obj, x, y in centroids:
+        for key in tile_keys(x, y, origin, tile_size, margin):
+            tiles.setdefault(key, []).append(obj)
+
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    template = tile_template(source_bytes)
+    written = {}
+    for (column, row), objects in sorted(tiles.items()):
+        output = rg.File3dm.FromByteArray(template)
+        for obj in objects:
+            output.Objects.Add(obj.Geometry, obj.Attributes)
+        path = os.path.join(output_dir, f"{stem}_tile_{column}_{row}.3dm")
+        output.Write(path, 7)
+        written[(column, row)] = path
+
+    placed_count = sum(len(objects) for objects in tiles.values())
+    print("\nFinal Report:")
+    print("Binned {0} objects into {1} tiles of {2} units (margin {3})".format(len(centroids), len(written), tile_size, margin))
+    print("Wrote {0} object copies, {1} from overlap".format(placed_count, placed_count - len(centroids)))
+    print("Skipped {0} objects without a valid bounding box".format(skipped_count))
+    print("Processing time: {0:.2f} seconds".format(time.time() - start_time))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split a .3dm file into a grid of spatial tiles, without Rhino.")
+    parser.add_argument("source")
+    parser.add_argument("output_dir")
+    parser.add_argument("tile_size", type=float)
+    parser.add_argument("--margin", type=float, default=0.0)
+    args = parser.parse_args()
+    tile_3dm(args.source, args.output_dir, args.tile_size, args.margin)
@@ -0,0 +1,190 @@
+"""Incremental sunlight recompute for design iterations that change a few buildings.
+
+SunlightState keeps, per building, its geometry hash and voxels, plus one lit
+bit per (receiver voxel, sun position) packed eight to a byte. When buildings
+change, only receivers whose ray toward a sun can cross the old or new bounding
+box of a changed building are traced again for that sun; every other bit is
+reused, and hours are recounted from the bits.
+"""
+import json
+import os
+
+import numpy as np
+
+from instrumentation import current
+from voxel_grid import BrickGrid, SparseVoxelValues
+from voxel_shadows import _counter_dtype, cast_shadow_sparse
+
+ROW_CHUNK = 1 << 16
+
+
+def _linear_keys(indices, shape):
+    return np.ravel_multi_index(tuple(np.asarray(indices, dtype=np.int64).T), shape)
+
+
+def _set_bits(packed, rows, column, values):
+    byte, bit = column >> 3, np.uint8(0x80 >> (column & 7))
+    packed[rows, byte] = np.where(values, packed[rows, byte] | bit, packed[rows, byte] & ~bit)
+
+
+def rays_cross_box(receivers, sun_vector, box_min, box_max):
+    """Flags for receivers whose ray toward the sun enters the voxel box [box_min, box_max].
+
+    The box is grown by one voxel to cover the rounding of ray offsets, so the
+    test is conservative: it may flag a receiver whose shading cannot change,
+    never the other way round.
+    """
+    direction = np.asarray(sun_vector, dtype=float)
+    step = direction / np.abs(direction).max()
+    low = np.asarray(box_min, dtype=float) - 1
+    high = np.asarray(box_max, dtype=float) + 1
+    t_enter = np.full(len(receivers), 1.0)
+    t_exit = np.full(len(receivers), np.inf)
+    for axis in range(3):
+        position = receivers[:, axis].astype(float)
+        if step[axis] == 0:
+            outside = (position < low[axis]) | (position > high[axis])
+            t_exit[outside] = -np.inf
+            continue
+        t1 = (low[axis] - position) / step[axis]
+        t2 = (high[axis] - position) / step[axis]
+        t_enter = np.maximum(t_enter, np.minimum(t1, t2))
+        t_exit = np.minimum(t_exit, np.maximum(t1, t2))
+    return t_exit >= t_enter
+
+
+class SunlightState(object):
+    """Persisted occupancy, per-building voxels and per-sun lit bits of one analysis."""
+
+    def __init__(self, shape, origin, voxel_size, sun_positions, brick_size=32):
+        self.shape = tuple(int(s) for s in shape)
+        self.origin = np.asarray(origin, dtype=float)
+        self.voxel_size = float(voxel_size)
+        self.sun_positions = np.asarray(sun_positions, dtype=float).reshape(-1, 3)
+        self.brick_size = brick_size
+        self.building_hashes = {}
+        self.building_voxels = {}
+        self.grid = BrickGrid(self.shape, brick_size)
+        self.receivers = np.zeros((0, 3), dtype=np.int64)
+        self.lit = np.zeros((0, (len(self.sun_positions) + 7) // 8), dtype=np.uint8)
+
+    def _rebuild_grid(self):
+        self.grid = BrickGrid(self.shape, self.brick_size)
+        for voxels in self.building_voxels.values():
+            self.grid.add(voxels)
+
+    def _trace(self, rows, column):
+        """Recompute the lit bits of receiver rows for one sun position."""
+        if len(rows):
+            shadowed = cast_shadow_sparse(self.grid, self.receivers[rows], self.sun_positions[column], self.grid.extent())
+            run = current()
+            if run.enabled:
+                run.count("voxels_shadowed", int(np.count_nonzero(shadowed)))
+                run.count("rays_traced", len(rows))
+            _set_bits(self.lit, rows, column, ~shadowed)
+
+    def compute(self, building_hashes, building_voxels):
+        """Full analysis of the given buildings, replacing any previous state."""
+        self.building_hashes = dict(building_hashes)
+        self.building_voxels = dict(building_voxels)
+        self._rebuild_grid()
+        self.receivers = self.grid.surface_indices()
+        self.lit = np.zeros((len(self.receivers), (len(self.sun_positions) + 7) // 8), dtype=np.uint8)
+        rows = np.arange(len(self.receivers))
+        for column in range(len(self.sun_positions)):
+            self._trace(rows, column)
+
+    def changed_buildings(self, building_hashes):
+        """Ids of buildings that were added, removed or whose geometry hash differs."""
+        ids = set(building_hashes) | set(self.building_hashes)
+        return sorted(i for i in ids if building_hashes.get(i) != self.building_hashes.get(i))
+
+    def update(self, building_hashes, voxelize):
+        """Patch the state after buildings changed; voxelize(ids) returns {id: (N, 3) voxel indices}.
+
+        Returns the number of (receiver, sun) rays traced again. Raises ValueError,
+        leaving the state untouched, if a changed building reaches outside the grid.
+        """
+        changed = self.changed_buildings(building_hashes)
+        if not changed:
+            return 0
+        new_voxels = voxelize([i for i in changed if i in building_hashes])
+        if not all(self.contains_voxels(voxels) for voxels in new_voxels.values()):
+            raise ValueError("Changed buildings extend beyond the stored grid; run a full analysis")
+        boxes = []
+        for building_id in changed:
+            for voxels in (self.building_voxels.get(building_id), new_voxels.get(building_id)):
+                if voxels is not None and len(voxels):
+                    boxes.append((voxels.min(axis=0), voxels.max(axis=0)))
+            self.building_voxels.pop(building_id, None)
+            if building_id in new_voxels:
+                self.building_voxels[building_id] = new_voxels[building_id]
+        self.building_hashes = dict(building_hashes)
+        self._rebuild_grid()
+
+        # Carry over bits of receivers that are still receivers; new ones are traced for every sun
+        old_keys = _linear_keys(self.receivers, self.shape)
+        old_order = np.argsort(old_keys)
+        receivers = self.grid.surface_indices()
+        keys = _linear_keys(receivers, self.shape)
+        position = np.minimum(np.searchsorted(old_keys[old_order], keys), max(len(old_keys) - 1, 0))
+        kept = (old_keys[old_order][position] == keys) if len(old_keys) else np.zeros(len(keys), dtype=bool)
+        lit = np.zeros((len(receivers), self.lit.shape[1]), dtype=np.uint8)
+        lit[kept] = self.lit[old_order[position[kept]]]
+        self.receivers, self.lit = receivers, lit
+
+        fresh = np.flatnonzero(~kept)
+        traced = 0
+        for column, sun_vector in enumerate(self.sun_positions):
+            if sun_vector[2] <= 0:
+                _set_bits(self.lit, fresh, column, False)
+                continue
+            affected = np.zeros(len(receivers), dtype=bool)
+            affected[fresh] = True
+            for box_min, box_max in boxes:
+                affected |= rays_cross_box(receivers, sun_vector, box_min, box_max)
+            rows = np.flatnonzero(affected)
+            self._trace(rows, column)
+            traced += len(rows)
+        return traced
+
+    def hours(self):
+        """Sunlight hours of every receiver as SparseVoxelValues, counted from the lit bits."""
+        count = len(self.sun_positions)
+        hours = np.zeros(len(self.receivers), dtype=_counter_dtype(count))
+        for start in range(0, len(self.receivers), ROW_CHUNK):
+            bits = np.unpackbits(self.lit[start:start + ROW_CHUNK], axis=1, count=count)
+            hours[start:start + ROW_CHUNK] = bits.sum(axis=1)
+        return SparseVoxelValues(self.receivers, hours, self.shape)
+
+    def contains_voxels(self, voxels):
+        """True if every voxel index lies inside the state's grid."""
+        voxels = np.asarray(voxels).reshape(-1, 3)
+        return bool(np.all((voxels >= 0) & (voxels < np.array(self.shape))))
+
+    def save(self, directory):
+        os.makedirs(os.path.join(directory, "grid"), exist_ok=True)
+        self.grid.save(os.path.join(directory, "grid"))
+        ids = sorted(self.building_voxels)
+        voxels = [self.building_voxels[i] for i in ids]
+        np.savez(os.path.join(directory, "state.npz"), shape=np.array(self.shape), origin=self.origin,
+                 voxel_size=self.voxel_size, sun_positions=self.sun_positions, brick_size=self.brick_size,
+                 receivers=self.receivers, lit=self.lit,
+                 building_voxels=np.concatenate(voxels) if voxels else np.zeros((0, 3), dtype=np.int64),
+                 building_offsets=np.cumsum([0] + [len(v) for v in voxels]))
+        with open(os.path.join(directory, "buildings.json"), "w") as f:
+            json.dump({'ids': ids, 'hashes': self.building_hashes}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, "state.npz")) as data:
+            state = cls(data['shape'], data['origin'], float(data['voxel_size']), data['sun_positions'], int(data['brick_size']))
+            state.receivers = data['receivers']
+            state.lit = data['lit']
+            voxels, offsets = data['building_voxels'], data['building_offsets']
+        with open(os.path.join(directory, "buildings.json")) as f:
+            buildings = json.load(f)
+        state.building_hashes = buildings['hashes']
+        state.building_voxels = {i: voxels[offsets[k]:offsets[k + 1]] for k, i in enumerate(buildings['ids'])}
+        state.grid = BrickGrid.load(os.path.join(directory, "grid"))
+        return state
@@ -0,0 +1,218 @@
+"""Lightweight run instrumentation shared by the Rhino scripts and the voxel pipeline.
+
+A run records nested timing spans, named counters and peak memory, and writes
+them as JSON lines (one record per span as it ends, then counters, memory and
+an optional cProfile summary when the run finishes). Throttled progress lines
+go to the console whether or not a run is recording.
+
+Recording is off unless start_run gets an output path or the INSTRUMENT_LOG
+environment variable names one; code can then call current() freely, as the
+inactive run's span and count are no-ops. Runs in IronPython and CPython.
+"""
+import json
+import os
+import sys
+import time
+import uuid
+
+LOG_ENV_VAR = "INSTRUMENT_LOG"
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_memory_bytes():
+    """Peak resident memory of this process in bytes, or None where it cannot be read."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        import System.Diagnostics
+        return System.Diagnostics.Process.GetCurrentProcess().PeakWorkingSet64
+    except ImportError:
+        return None
+
+
+class Progress(object):
+    """Console progress for one loop, printed at most once per interval seconds and on completion."""
+
+    def __init__(self, name, total=None, interval=2.0):
+        self.name = name
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self._start = self._last = time.time()
+
+    def update(self, n=1):
+        self.done += n
+        now = time.time()
+        if now - self._last >= self.interval or (self.total is not None and self.done >= self.total):
+            self._last = now
+            self._report(now)
+
+    def _report(self, now):
+        if self.total:
+            print("{0}: {1}/{2} ({3:.0f}%) after {4:.1f} s".format(
+                self.name, self.done, self.total, 100.0 * self.done / self.total, now - self._start))
+        else:
+            print("{0}: {1} after {2:.1f} s".format(self.name, self.done, now - self._start))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Counters(object):
+    """Plain counter tally, e.g. for a worker process to return to the run in its parent."""
+
+    enabled = True
+
+    def __init__(self):
+        self.counters = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+class _Span(object):
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.run._stack.append(self.name)
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.time() - self._start
+        run = self.run
+        run._write({'type': 'span', 'path': "/".join(run._stack), 'seconds': seconds,
+                    'start': self._start - run.start_time, 'peak_memory': peak_memory_bytes()})
+        run._stack.pop()
+        return False
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullRun(object):
+    """Run that records nothing; spans and counters cost one method call."""
+
+    enabled = False
+
+    def span(self, name):
+        return _NULL_SPAN
+
+    def count(self, name, n=1):
+        pass
+
+    def merge(self, counters):
+        pass
+
+    def progress(self, name, total=None, interval=2.0):
+        return Progress(name, total, interval)
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+        return False
+
+
+class Run(NullRun):
+    """Recording run writing JSON lines to output_path."""
+
+    enabled = True
+
+    def __init__(self, name, output_path, profile=False):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.counters = {}
+        self.start_time = time.time()
+        self._stack = []
+        self._file = open(output_path, 'a')
+        self._profiler = None
+        if profile:
+            try:
+                import cProfile
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            except ImportError:
+                pass  # no cProfile in this interpreter; spans and counters still work
+        self._write({'type': 'start', 'name': name, 'time': self.start_time})
+
+    def _write(self, record):
+        record['run'] = self.run_id
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, counters):
+        """Add a {name: value} tally, such as Counters.counters from a worker."""
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def finish(self, top=20):
+        if self._file is None:
+            return
+        global _current
+        for name in sorted(self.counters):
+            self._write({'type': 'counter', 'name': name, 'value': self.counters[name]})
+        self._write({'type': 'memory', 'peak_memory': peak_memory_bytes()})
+        if self._profiler is not None:
+            import pstats
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler).stats
+            rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+            self._write({'type': 'profile', 'functions': [
+                {'function': "{0}:{1}({2})".format(*key), 'calls': value[1], 'total': value[2], 'cumulative': value[3]}
+                for key, value in rows]})
+        self._write({'type': 'end', 'seconds': time.time() - self.start_time})
+        self._file.close()
+        self._file = None
+        if _current is self:
+            _current = _NULL_RUN
+
+
+_NULL_RUN = NullRun()
+_current = _NULL_RUN
+
+
+def current():
+    """The active run, or an inactive one that records nothing."""
+    return _current
+
+
+def start_run(name, output_path=None, profile=False):
+    """Make a new run current; it records only when output_path or $INSTRUMENT_LOG is set.
+
+    Use it as a context manager, or call finish() when done, to write counters,
+    peak memory and the profile summary.
+    """
+    global _current
+    output_path = output_path or os.environ.get(LOG_ENV_VAR)
+    _current = Run(name, output_path, profile) if output_path else _NULL_RUN
+    return _current
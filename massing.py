@@ -0,0 +1,206 @@
+"""Parametric lot massing from a table of lot and zoning parameters.
+
+No Rhino imports, so it runs in IronPython inside Rhino and in CPython.
+Floor plates are boxes stored column-wise in array('d') columns as
+(x, y, z, width, depth, height), with (x, y, z) the lower corner.
+"""
+import csv
+import math
+from array import array
+from collections import OrderedDict
+
+STYLES = ('low', 'pyramid', 'inverted_pyramid', 'tapered')
+
+# Defaults match the yard and floor rules of CreateLowMedHighDensityBldgs
+LOT_DEFAULTS = {
+    'style': 'low',
+    'far': 0.9,
+    'front_yard': 5.0,
+    'rear_yard': 30.0,
+    'side_yard': 4.0,
+    'num_floors': 1,
+    'floor_height': 10.0
+}
+
+NUMERIC_FIELDS = ('x', 'y', 'width', 'length', 'far', 'front_yard', 'rear_yard', 'side_yard', 'floor_height')
+
+
+def solve_massing(style, lot_width, lot_length, far, front_yard, rear_yard, side_yard, num_floors, floor_height):
+    """Floor plates of one lot as (x, y, z, width, depth, height) tuples relative to the lot corner.
+
+    'low' is a side-yard footprint repeated for as many floors as the FAR allows;
+    'pyramid' and 'inverted_pyramid' shrink or grow a centered plate by 10% per
+    floor; 'tapered' scales width and length down by 10% of the lot per floor.
+    Every multi-floor style caps each floor at an equal share of the FAR area.
+    """
+    if style not in STYLES:
+        raise ValueError("Unknown massing style: {0}".format(style))
+    max_floor_area = far * lot_width * lot_length
+    depth = lot_length - front_yard - rear_yard
+    plates = []
+
+    if style == 'low':
+        width = lot_width - 2 * side_yard
+        if width <= 0 or depth <= 0:
+            return ()
+        if width * depth > max_floor_area:
+            width = max_floor_area / depth
+        floors = max(1, min(num_floors, int(max_floor_area / (width * depth) + 1e-9)))
+        for k in range(floors):
+            plates.append((side_yard, front_yard, k * floor_height, width, depth, floor_height))
+        return tuple(plates)
+
+    floor_cap = max_floor_area / num_floors
+    if style in ('pyramid', 'inverted_pyramid'):
+        if depth <= 0:
+            return ()
+        factor = 0.9 if style == 'pyramid' else 1 / 0.9
+        width = lot_width * 0.6 * (1 if style == 'pyramid' else 0.9 ** (num_floors - 1))
+        for k in range(num_floors):
+            if width * depth > floor_cap:
+                # Adjust the footprint to meet the FAR requirement
+                width = floor_cap / depth
+            plates.append(((lot_width - width) / 2, front_yard, k * floor_height, width, depth, floor_height))
+            width *= factor
+        return tuple(plates)
+
+    for k in range(num_floors):
+        width = lot_width * (1 - 0.1 * k)
+        length = lot_length * (1 - 0.1 * k) - rear_yard
+        if width <= 0 or length <= 0:
+            break
+        if width * length > floor_cap:
+            # Adjust the footprint to meet the FAR requirement
+            scaling_factor = (floor_cap / (width * length)) ** 0.5
+            width *= scaling_factor
+            length *= scaling_factor
+        plates.append(((lot_width - width) / 2, front_yard, k * floor_height, width, length, floor_height))
+    return tuple(plates)
+
+
+class BoundedCache(object):
+    """Least-recently-used memo of at most maxsize results, keyed on argument tuples."""
+
+    def __init__(self, function, maxsize=4096):
+        self.function = function
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __call__(self, *args):
+        result = self._results.pop(args, None)
+        if result is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            result = self.function(*args)
+            if len(self._results) >= self.maxsize:
+                self._results.popitem(last=False)
+        self._results[args] = result
+        return result
+
+    def clear(self):
+        self._results.clear()
+        self.hits = self.misses = 0
+
+
+# Lots in a sweep repeat a handful of (style, size, FAR, yards, floors) types
+solve_massing_cached = BoundedCache(solve_massing)
+
+
+class FloorPlates(object):
+    """Column storage for the floor plates of many lots."""
+
+    def __init__(self):
+        self.lot = array('l')
+        self.x = array('d')
+        self.y = array('d')
+        self.z = array('d')
+        self.width = array('d')
+        self.depth = array('d')
+        self.height = array('d')
+
+    def __len__(self):
+        return len(self.lot)
+
+    def extend(self, lot_index, origin_x, origin_y, plates):
+        for x, y, z, width, depth, height in plates:
+            self.lot.append(lot_index)
+            self.x.append(origin_x + x)
+            self.y.append(origin_y + y)
+            self.z.append(z)
+            self.width.append(width)
+            self.depth.append(depth)
+            self.height.append(height)
+
+    def corners(self):
+        """(min_corner, max_corner) point tuples of every plate, in order."""
+        for i in range(len(self.lot)):
+            yield ((self.x[i], self.y[i], self.z[i]),
+                   (self.x[i] + self.width[i], self.y[i] + self.depth[i], self.z[i] + self.height[i]))
+
+
+def read_lot_table(file_path):
+    """Lots from a CSV with width, length and optional style, far, yards, num_floors, floor_height, x, y columns."""
+    lots = []
+    with open(file_path, 'r') as f:
+        for row_number, row in enumerate(csv.DictReader(f), 2):
+            lot = dict(LOT_DEFAULTS)
+            try:
+                for key, value in row.items():
+                    if value in (None, ''):
+                        continue
+                    if key in NUMERIC_FIELDS:
+                        lot[key] = float(value)
+                    elif key == 'num_floors':
+                        lot[key] = int(value)
+                    elif key == 'style':
+                        lot[key] = value.strip()
+                if 'width' not in lot or 'length' not in lot:
+                    raise ValueError("missing width or length")
+            except ValueError:
+                raise Exception("Invalid lot in {0} at row {1}".format(file_path, row_number))
+            lots.append(lot)
+    return lots
+
+
+def layout_lots(lots, spacing=20.0, columns=None):
+    """Give lots without an x/y position a place on a uniform grid, row by row."""
+    if not lots:
+        return lots
+    columns = columns or int(math.ceil(math.sqrt(len(lots))))
+    pitch_x = max(lot['width'] for lot in lots) + spacing
+    pitch_y = max(lot['length'] for lot in lots) + spacing
+    for i, lot in enumerate(lots):
+        lot.setdefault('x', (i % columns) * pitch_x)
+        lot.setdefault('y', (i // columns) * pitch_y)
+    return lots
+
+
+def generate_massing(lots, spacing=20.0, columns=None):
+    """Solve every lot into one FloorPlates table plus a per-lot FAR report.
+
+    Report rows are dicts with lot, style, far_limit, far_achieved and floor_area.
+    """
+    layout_lots(lots, spacing, columns)
+    plates = FloorPlates()
+    report = []
+    for i, lot in enumerate(lots):
+        lot_plates = solve_massing_cached(lot['style'], lot['width'], lot['length'], lot['far'], lot['front_yard'],
+                                          lot['rear_yard'], lot['side_yard'], lot['num_floors'], lot['floor_height'])
+        plates.extend(i, lot['x'], lot['y'], lot_plates)
+        floor_area = sum(p[3] * p[4] for p in lot_plates)
+        report.append({'lot': i, 'style': lot['style'], 'far_limit': lot['far'],
+                       'far_achieved': floor_area / (lot['width'] * lot['length']), 'floor_area': floor_area})
+    return plates, report
+
+
+def far_report(report):
+    """One line per lot comparing achieved FAR to the limit, flagging lots over it."""
+    lines = []
+    for row in report:
+        over = " OVER LIMIT" if row['far_achieved'] > row['far_limit'] + 1e-6 else ""
+        lines.append("Lot {0} ({1}): FAR {2:.2f} of {3:.2f}{4}".format(
+            row['lot'], row['style'], row['far_achieved'], row['far_limit'], over))
+    return "\n".join(lines)
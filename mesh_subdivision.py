@@ -0,0 +1,170 @@
+"""Pure mesh subdivision on plain vertex and face lists.
+
+No Rhino imports, so it runs in IronPython inside Rhino and in CPython for
+testing. Vertices are (x, y, z) tuples and faces are tuples of 3 or 4 vertex
+indices.
+"""
+
+
+def _distance(p, q):
+    return ((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2) ** 0.5
+
+
+def _average(points):
+    n = float(len(points))
+    return (sum(p[0] for p in points) / n, sum(p[1] for p in points) / n, sum(p[2] for p in points) / n)
+
+
+class MidpointIndex(object):
+    """Shared edge midpoints, keyed by the sorted vertex index pair of the edge.
+
+    Both faces on an edge get the same midpoint vertex in O(1), instead of a
+    linear search through the growing vertex list.
+    """
+
+    def __init__(self, vertices):
+        self.vertices = vertices
+        self._midpoints = {}
+
+    def midpoint(self, a, b):
+        key = (a, b) if a < b else (b, a)
+        index = self._midpoints.get(key)
+        if index is None:
+            index = len(self.vertices)
+            self.vertices.append(_average([self.vertices[a], self.vertices[b]]))
+            self._midpoints[key] = index
+        return index
+
+
+def split_face(face, vertices, midpoints):
+    """Split a triangle into 4 triangles, or a quad into 4 quads around its center."""
+    m = [midpoints.midpoint(face[i], face[(i + 1) % len(face)]) for i in range(len(face))]
+    if len(face) == 4:
+        center = len(vertices)
+        vertices.append(_average([vertices[i] for i in face]))
+        return [(face[0], m[0], center, m[3]),
+                (m[0], face[1], m[1], center),
+                (center, m[1], face[2], m[2]),
+                (m[3], center, m[2], face[3])]
+    return [(face[0], m[0], m[2]),
+            (m[0], face[1], m[1]),
+            (m[2], m[1], face[2]),
+            (m[0], m[1], m[2])]
+
+
+def subdivide_faces(vertices, faces, min_edge_length=1.0):
+    """Split every face that has an edge longer than min_edge_length once.
+
+    Returns (vertices, faces) as new lists; the input vertices keep their indices
+    and new midpoint and center vertices are appended after them.
+    """
+    new_vertices = list(vertices)
+    midpoints = MidpointIndex(new_vertices)
+    new_faces = []
+    for face in faces:
+        corners = [vertices[i] for i in face]
+        if all(_distance(corners[i], corners[(i + 1) % len(face)]) <= min_edge_length for i in range(len(face))):
+            new_faces.append(tuple(face))
+        else:
+            new_faces.extend(split_face(face, new_vertices, midpoints))
+    return new_vertices, new_faces
+
+
+def _triangle_area(p, q, r):
+    ux, uy, uz = q[0] - p[0], q[1] - p[1], q[2] - p[2]
+    vx, vy, vz = r[0] - p[0], r[1] - p[1], r[2] - p[2]
+    cx, cy, cz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+    return 0.5 * (cx * cx + cy * cy + cz * cz) ** 0.5
+
+
+def face_area(face, vertices):
+    corners = [vertices[i] for i in face]
+    area = _triangle_area(corners[0], corners[1], corners[2])
+    if len(face) == 4:
+        area += _triangle_area(corners[0], corners[2], corners[3])
+    return area
+
+
+def _edge_key(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def _close_face(face, split, vertices, midpoints):
+    """Split a face whose edges are only partly in the split set, matching its neighbours' midpoints.
+
+    Triangles with one split edge are bisected toward the opposite corner, and
+    with two split edges become a corner triangle plus two triangles. Quads with
+    two opposite split edges become two quads; any other pattern is fanned from
+    the face center so every split edge is honoured.
+    """
+    n = len(face)
+    flags = [_edge_key(face[i], face[(i + 1) % n]) in split for i in range(n)]
+    if n == 3 and sum(flags) in (1, 2):
+        # Rotate so the last edge (v2, v0) is unsplit when two are split, or the first is split when one is
+        shift = flags.index(True) if sum(flags) == 1 else (flags.index(False) + 1) % 3
+        v = [face[(i + shift) % 3] for i in range(3)]
+        m0 = midpoints.midpoint(v[0], v[1])
+        if sum(flags) == 1:
+            return [(v[0], m0, v[2]), (m0, v[1], v[2])]
+        m1 = midpoints.midpoint(v[1], v[2])
+        return [(m0, v[1], m1), (v[0], m0, m1), (v[0], m1, v[2])]
+    if n == 4 and flags in ([True, False, True, False], [False, True, False, True]):
+        shift = 0 if flags[0] else 1
+        v = [face[(i + shift) % 4] for i in range(4)]
+        m0 = midpoints.midpoint(v[0], v[1])
+        m2 = midpoints.midpoint(v[2], v[3])
+        return [(v[0], m0, m2, v[3]), (m0, v[1], v[2], m2)]
+
+    boundary = []
+    for i in range(n):
+        boundary.append(face[i])
+        if flags[i]:
+            boundary.append(midpoints.midpoint(face[i], face[(i + 1) % n]))
+    center = len(vertices)
+    vertices.append(_average([vertices[i] for i in face]))
+    return [(boundary[i], boundary[(i + 1) % len(boundary)], center) for i in range(len(boundary))]
+
+
+def refine_to_target(vertices, faces, target_edge_length=None, target_area=None, max_levels=6):
+    """Refine a mesh in memory until every face meets the target edge length and/or area.
+
+    Each level splits every face that is still too large into four and then
+    closes the neighbouring faces against the new edge midpoints, so the mesh
+    stays conforming (no T-junctions) between split and unsplit faces.
+    Stops after max_levels levels. Returns (vertices, faces, levels_used).
+    """
+    if target_edge_length is None and target_area is None:
+        raise ValueError("refine_to_target needs a target_edge_length or a target_area")
+
+    def too_large(face):
+        if target_area is not None and face_area(face, vertices) > target_area:
+            return True
+        if target_edge_length is not None:
+            n = len(face)
+            return any(_distance(vertices[face[i]], vertices[face[(i + 1) % n]]) > target_edge_length for i in range(n))
+        return False
+
+    vertices = list(vertices)
+    faces = [tuple(face) for face in faces]
+    for level in range(max_levels):
+        marked = [too_large(face) for face in faces]
+        if not any(marked):
+            return vertices, faces, level
+        split = set()
+        for face, is_marked in zip(faces, marked):
+            if is_marked:
+                split.update(_edge_key(face[i], face[(i + 1) % len(face)]) for i in range(len(face)))
+
+        midpoints = MidpointIndex(vertices)
+        new_faces = []
+        for face, is_marked in zip(faces, marked):
+            n = len(face)
+            split_edges = sum(_edge_key(face[i], face[(i + 1) % n]) in split for i in range(n))
+            if is_marked or split_edges == n:
+                new_faces.extend(split_face(face, vertices, midpoints))
+            elif split_edges:
+                new_faces.extend(_close_face(face, split, vertices, midpoints))
+            else:
+                new_faces.append(face)
+        faces = new_faces
+    return vertices, faces, max_levels
@@ -0,0 +1,64 @@
+"""Pure Python 2D KD-tree for nearest-parcel lookups.
+
+Has no Rhino or NumPy dependency so it runs in IronPython inside Rhino and in
+CPython for testing; coordinates are plain sequences of floats.
+"""
+
+
+class KDTree2D(object):
+    """Balanced, implicitly stored KD-tree over 2D points.
+
+    The tree lives in flat lists: the node for a half-open range [lo, hi) is the
+    median at (lo + hi) // 2, split on x at even depths and y at odd depths.
+    Build is O(n log^2 n) and each nearest query is O(log n) on average.
+    """
+
+    def __init__(self, xs, ys):
+        order = list(range(len(xs)))
+        # Iterative build: sort each range on its split axis and recurse on both halves
+        stack = [(0, len(order), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= 1:
+                continue
+            coords = xs if depth % 2 == 0 else ys
+            order[lo:hi] = sorted(order[lo:hi], key=lambda i: coords[i])
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+        self._index = order
+        self._x = [float(xs[i]) for i in order]
+        self._y = [float(ys[i]) for i in order]
+
+    def __len__(self):
+        return len(self._index)
+
+    def nearest(self, x, y):
+        """(index into the original points, distance) of the point closest to (x, y)."""
+        if not self._index:
+            return None, None
+        px, py = self._x, self._y
+        best = -1
+        best_d2 = float('inf')
+        # Each entry carries a lower bound on the squared distance to anything in its range
+        stack = [(0, len(px), 0, 0.0)]
+        while stack:
+            lo, hi, depth, bound = stack.pop()
+            if lo >= hi or bound >= best_d2:
+                continue
+            mid = (lo + hi) // 2
+            dx = x - px[mid]
+            dy = y - py[mid]
+            d2 = dx * dx + dy * dy
+            if d2 < best_d2:
+                best, best_d2 = mid, d2
+            diff = dx if depth % 2 == 0 else dy
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            # The far side is pushed first so the near side is explored first
+            stack.append((far[0], far[1], depth + 1, max(bound, diff * diff)))
+            stack.append((near[0], near[1], depth + 1, bound))
+        return self._index[best], best_d2 ** 0.5
+
+    def query(self, points):
+        """Nearest original point index for every (x, y) in points, in one call."""
+        return [self.nearest(x, y)[0] for x, y in points]
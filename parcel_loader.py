@@ -0,0 +1,115 @@
+"""Streaming loader for parcel metric CSV exports with GeoJSON geometry columns.
+
+Reads one row at a time and keeps only a representative coordinate and one
+numeric value per row in array('d') columns, so memory grows with the kept
+columns rather than the file. Runs in IronPython and CPython.
+"""
+import csv
+import json
+import sys
+from array import array
+
+# Allow multi-megabyte geometry cells; IronPython rejects sys.maxsize here
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+SUPPORTED_GEOMETRY_TYPES = ('Point', 'Polygon')
+
+
+class ParcelPoints(object):
+    """Column storage for loaded parcels plus a summary of rejected rows."""
+
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.values = array('d')
+        self.error_counts = {}
+        self.error_samples = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def reject(self, reason, row_number, sample_limit=3):
+        self.error_counts[reason] = self.error_counts.get(reason, 0) + 1
+        samples = self.error_samples.setdefault(reason, [])
+        if len(samples) < sample_limit:
+            samples.append(row_number)
+
+    def report(self):
+        """One summary line per rejection reason, with the first offending row numbers."""
+        lines = ["Loaded {0} parcels".format(len(self))]
+        for reason in sorted(self.error_counts):
+            lines.append("Skipped {0} rows: {1} (e.g. rows {2})".format(
+                self.error_counts[reason], reason, ", ".join(str(n) for n in self.error_samples[reason])))
+        return "\n".join(lines)
+
+
+def _geometry_type(geometry_str):
+    """Value of the top-level "type" member, found without parsing the whole document."""
+    key = geometry_str.find('"type"')
+    if key < 0:
+        return None
+    start = geometry_str.find('"', geometry_str.find(':', key) + 1)
+    end = geometry_str.find('"', start + 1)
+    if start < 0 or end < 0:
+        return None
+    return geometry_str[start + 1:end]
+
+
+def first_coordinate(geometry_str):
+    """First (x, y) of a GeoJSON Point or Polygon (first exterior ring vertex).
+
+    The fast path reads the two numbers after the first '[' run of the
+    coordinates member directly; anything it cannot read falls back to json.
+    Raises ValueError for unsupported or unreadable geometry.
+    """
+    geometry_type = _geometry_type(geometry_str)
+    if geometry_type not in SUPPORTED_GEOMETRY_TYPES:
+        raise ValueError("unsupported geometry type {0}".format(geometry_type))
+
+    key = geometry_str.find('"coordinates"')
+    if key >= 0:
+        start = geometry_str.find('[', key)
+        while 0 <= start < len(geometry_str) and geometry_str[start] in '[ \t\r\n':
+            start += 1
+        end = geometry_str.find(']', start)
+        if start >= 0 and end > start:
+            try:
+                parts = geometry_str[start:end].split(',')
+                return float(parts[0]), float(parts[1])
+            except (IndexError, ValueError):
+                pass
+
+    geometry = json.loads(geometry_str)
+    coordinates = geometry['coordinates']
+    if geometry['type'] == 'Polygon':
+        coordinates = coordinates[0][0]
+    return float(coordinates[0]), float(coordinates[1])
+
+
+def load_parcel_points(file_path, value_field='equity_multiple_mean', geometry_field='geometry'):
+    """Stream a parcel CSV into ParcelPoints, keeping only value_field and a coordinate per row."""
+    parcels = ParcelPoints()
+    with open(file_path, 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        try:
+            value_column = header.index(value_field)
+            geometry_column = header.index(geometry_field)
+        except ValueError:
+            raise Exception("CSV {0} must have '{1}' and '{2}' columns".format(file_path, value_field, geometry_field))
+
+        for row_number, row in enumerate(reader, 2):
+            try:
+                value = float(row[value_column])
+            except (IndexError, ValueError):
+                parcels.reject("invalid {0}".format(value_field), row_number)
+                continue
+            try:
+                x, y = first_coordinate(row[geometry_column])
+            except (IndexError, KeyError, TypeError, ValueError) as e:
+                parcels.reject("bad geometry: {0}".format(e) if "unsupported" in str(e) else "bad geometry", row_number)
+                continue
+            parcels.xs.append(x)
+            parcels.ys.append(y)
+            parcels.values.append(value)
+    return parcels
@@ -0,0 +1,233 @@
+"""Benchmarks of the pipeline hot paths on seeded synthetic cities, without Rhino.
+
+Each stage runs at every scale (number of buildings) and keeps the best of a
+few repeats. Times are divided by a fixed calibration workload timed in the
+same run, so a uniformly faster or busier machine does not shift the results.
+They are compared against benchmark_baselines.json. A stage slower than its
+baseline by more than the tolerance is a regression and makes the run exit
+non-zero. Baselines are not shipped: the first run on a machine writes them,
+and --update-baseline refreshes them.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bbox_index import BoundingBoxIndex
+from mesh_subdivision import refine_to_target
+from parcel_index import KDTree2D
+from parcel_loader import load_parcel_points
+from sunlight_pipeline import extract_building_facades, extract_sun_positions, voxelize_buildings, voxelize_raster_inputs
+from synthetic_city import generate_city, write_city_3dm, write_parcel_csv
+from voxel_shadows import calculate_sunlight_hours
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+NYC = {'city': 'New York', 'latitude': 40.78, 'longitude': -73.97, 'timezone': -5.0, 'elevation': 40.0}
+VOXEL_SIZE = 4.0
+
+
+def _calibration_workload():
+    """Fixed mix of interpreter and NumPy work that the stage timings are divided by."""
+    total = 0
+    for i in range(200000):
+        total += i * i % 7
+    values = np.random.default_rng(0).random(1 << 20)
+    np.sort(values)
+    return total + float(np.cumsum(values)[-1])
+
+
+def _best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _year_records():
+    days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    months = np.repeat(np.arange(1, 13), np.array(days_in_month) * 24)
+    days = np.concatenate([np.repeat(np.arange(1, n + 1), 24) for n in days_in_month])
+    hours = np.tile(np.arange(1, 25), 365)
+    return months, days, hours
+
+
+def _facade_mesh(city):
+    """Vertices and quad faces of the four walls of every floor plate."""
+    vertices, faces = [], []
+    for (x0, y0, z0), (x1, y1, z1) in city.plate_boxes().tolist():
+        ring = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+        for k in range(4):
+            (ax, ay), (bx, by) = ring[k], ring[(k + 1) % 4]
+            base = len(vertices)
+            vertices.extend([(ax, ay, z0), (bx, by, z0), (bx, by, z1), (ax, ay, z1)])
+            faces.append((base, base + 1, base + 2, base + 3))
+    return vertices, faces
+
+
+def _raster_inputs(city):
+    """collect_raster_inputs-style (segments, footprints, closed meshes, open meshes) for the floor plates.
+
+    Plates cycle through the four kinds of building geometry: capped extrusions
+    (footprints), closed box meshes, open wall meshes and bare box edges.
+    """
+    segments, footprints, closed_meshes, open_meshes = [], [], [], []
+    for n, ((x0, y0, z0), (x1, y1, z1)) in enumerate(city.plate_boxes().tolist()):
+        ring = np.array([[x0, y0, z0], [x1, y0, z0], [x1, y1, z0], [x0, y1, z0], [x0, y0, z0]])
+        bottom, top = ring[:4], ring[:4] + [0.0, 0.0, z1 - z0]
+        walls = [tri for k in range(4) for tri in ([bottom[k], bottom[(k + 1) % 4], top[(k + 1) % 4]],
+                                                    [bottom[k], top[(k + 1) % 4], top[k]])]
+        if n % 4 == 0:
+            footprints.append((ring, z0, z1))
+        elif n % 4 == 1:
+            caps = [[bottom[0], bottom[2], bottom[1]], [bottom[0], bottom[3], bottom[2]],
+                    [top[0], top[1], top[2]], [top[0], top[2], top[3]]]
+            closed_meshes.append(np.array(walls + caps))
+        elif n % 4 == 2:
+            open_meshes.append(np.array(walls))
+        else:
+            corners = np.concatenate([bottom, top])
+            edges = [(k, (k + 1) % 4) for k in range(4)] + [(k + 4, (k + 1) % 4 + 4) for k in range(4)] + [(k, k + 4) for k in range(4)]
+            segments.extend(corners[list(edge)] for edge in edges)
+    return np.array(segments).reshape(-1, 2, 3), footprints, closed_meshes, open_meshes
+
+
+def _region_polygons(city, count, seed):
+    """Rotated rectangles scattered over the city extent, like hand-drawn study areas."""
+    rng = np.random.default_rng(seed)
+    boxes = city.plate_boxes()
+    low, high = boxes[:, 0, :2].min(axis=0), boxes[:, 1, :2].max(axis=0)
+    polygons = []
+    for _ in range(count):
+        center = rng.uniform(low, high)
+        half = (high - low) * rng.uniform(0.05, 0.2, 2)
+        angle = rng.uniform(0, np.pi)
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * half
+        polygons.append([tuple(p) for p in (corners @ rotation.T + center).tolist()])
+    return polygons
+
+
+def run_scale(n_buildings, seed, repeat, work_dir, sun_count=8):
+    """Seconds per stage for one synthetic city of n_buildings lots."""
+    city = generate_city(n_buildings, seed)
+    timings = {}
+
+    csv_path = os.path.join(work_dir, "parcels_{0}.csv".format(n_buildings))
+    write_parcel_csv(city, csv_path)
+    city_path = os.path.join(work_dir, "city_{0}.3dm".format(n_buildings))
+    try:
+        timings['write_3dm'] = _best_time(lambda: write_city_3dm(city, city_path), 1)
+        massing = extract_building_facades(city_path, layer_name="Massing")
+        timings['voxelize_buildings'] = _best_time(lambda: voxelize_buildings(massing, VOXEL_SIZE), repeat)
+    except ImportError:
+        pass  # rhino3dm not installed; the remaining stages do not need it
+
+    # The same rasterization path as voxelize_buildings, one kind of geometry per stage
+    segments, footprints, closed_meshes, open_meshes = raster_inputs = _raster_inputs(city)
+    empty = np.zeros((0, 2, 3))
+    for name, inputs in [('segments', (segments, [], [], [])), ('footprints', (empty, footprints, [], [])),
+                         ('closed_meshes', (empty, [], closed_meshes, [])), ('open_meshes', (empty, [], [], open_meshes))]:
+        timings['voxelize_' + name] = _best_time(lambda: voxelize_raster_inputs(inputs, VOXEL_SIZE), repeat)
+    grid = voxelize_raster_inputs(raster_inputs, VOXEL_SIZE)[0]
+
+    months, days, hours = _year_records()
+    weather = pd.DataFrame({'Month': months, 'Day': days, 'Hour': hours})
+    weather.attrs['location'] = NYC
+    timings['sun_positions'] = _best_time(lambda: extract_sun_positions(weather, 1, 1, 31, end_month=12), repeat)
+    sun_vectors = extract_sun_positions(weather, 1, 1, 31, end_month=12)
+    sample = sun_vectors[np.linspace(0, len(sun_vectors) - 1, sun_count).astype(int)]
+    timings['shadow_casting'] = _best_time(lambda: calculate_sunlight_hours(grid, sample, VOXEL_SIZE), repeat)
+
+    points = city.building_points().tolist()
+
+    def parcel_join():
+        parcels = load_parcel_points(csv_path)
+        return KDTree2D(parcels.xs, parcels.ys).query(points)
+    timings['parcel_join'] = _best_time(parcel_join, repeat)
+
+    vertices, faces = _facade_mesh(city)
+    timings['mesh_subdivision'] = _best_time(lambda: refine_to_target(vertices, faces, target_edge_length=6.0), repeat)
+
+    boxes = city.plate_boxes()
+    ids = [str(i) for i in range(len(boxes))]
+    flat_boxes = [(x0, y0, x1, y1) for (x0, y0, _), (x1, y1, _) in boxes.tolist()]
+    polygons = _region_polygons(city, 50, seed)
+
+    def bbox_extraction():
+        index = BoundingBoxIndex(ids, flat_boxes)
+        return [index.query_polygon(polygon) for polygon in polygons]
+    timings['bbox_extraction'] = _best_time(bbox_extraction, repeat)
+    return timings
+
+
+def compare(results, baselines, tolerance, min_delta=0.0):
+    """Report lines and the list of regressed stage keys.
+
+    Results and baselines are stage times in calibration units. Slowdowns under
+    min_delta are timer noise on the fastest stages and never count.
+    """
+    lines, regressions = [], []
+    for key in sorted(results):
+        relative = results[key]
+        baseline = baselines.get(key)
+        if baseline is None:
+            lines.append("{0:<28} {1:9.4f}  (no baseline)".format(key, relative))
+            continue
+        ratio = relative / baseline if baseline > 0 else float('inf')
+        flag = ""
+        if ratio > 1 + tolerance and relative - baseline > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        lines.append("{0:<28} {1:9.4f}  baseline {2:9.4f}  x{3:.2f}{4}".format(key, relative, baseline, ratio, flag))
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time pipeline stages on synthetic cities and check for regressions.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--keep", help="directory to keep the generated .3dm and CSV files in")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="slowdowns shorter than this never count")
+    args = parser.parse_args()
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        calibration = _best_time(_calibration_workload, args.repeat)
+        results = {}
+        for scale in args.scales:
+            for stage, seconds in run_scale(scale, args.seed, args.repeat, work_dir).items():
+                results["{0}@{1}".format(stage, scale)] = seconds / calibration
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print("Calibration workload: {0:.4f}s; times below are in multiples of it".format(calibration))
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    lines, regressions = compare(results, baselines, args.tolerance, args.min_seconds / calibration)
+    print("\n".join(lines))
+
+    if args.update_baseline or not baselines:
+        first_run = not baselines
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print("{0} baselines in {1}".format("Wrote first" if first_run else "Updated", args.baseline))
+    elif regressions:
+        print("{0} stage(s) regressed by more than {1:.0%}".format(len(regressions), args.tolerance))
+        raise SystemExit(1)
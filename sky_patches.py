@@ -0,0 +1,117 @@
+"""Binning of sun vectors into Tregenza/Reinhart sky patches.
+
+Annual studies trace thousands of nearly identical sun directions. Binning
+them into sky patches and tracing one representative direction per occupied
+patch, weighted by the hours (or irradiance) that fell into it, replaces an
+O(hours) shadow cost with an O(patches) one. Vectors use the solar_position
+convention: x east, y north, z up.
+"""
+import numpy as np
+
+# Tregenza sky: seven 12 degree altitude bands, then a zenith cap from 84 degrees
+_TREGENZA_BAND_COUNTS = (30, 30, 24, 24, 18, 12, 6)
+_TREGENZA_BAND_HEIGHT = 12.0
+
+
+def patch_layout(subdivisions=1):
+    """Per-row (lower altitude, altitude height, patch count) of a Reinhart sky, plus the zenith cap.
+
+    subdivisions=1 is the 145-patch Tregenza sky; Reinhart's MF splits every
+    Tregenza patch into MF x MF patches, keeping a single zenith cap.
+    """
+    rows = []
+    height = _TREGENZA_BAND_HEIGHT / subdivisions
+    for band, count in enumerate(_TREGENZA_BAND_COUNTS):
+        for sub_row in range(subdivisions):
+            rows.append((band * _TREGENZA_BAND_HEIGHT + sub_row * height, height, count * subdivisions))
+    cap_start = len(_TREGENZA_BAND_COUNTS) * _TREGENZA_BAND_HEIGHT
+    rows.append((cap_start, 90.0 - cap_start, 1))
+    return rows
+
+
+def patch_count(subdivisions=1):
+    return sum(count for _, _, count in patch_layout(subdivisions))
+
+
+def patch_error_bound(subdivisions=1):
+    """Approximate largest angle in degrees between two directions in the same patch.
+
+    Any representative inside a patch, such as the mean direction of its sun
+    vectors, is within this angle of every vector binned into it.
+    """
+    bound = 0.0
+    for low, height, count in patch_layout(subdivisions):
+        if count == 1:
+            bound = max(bound, 2 * height)
+            continue
+        # Widest azimuth span of the row is at its lower edge
+        width = np.deg2rad(360.0 / count) * np.cos(np.deg2rad(low))
+        bound = max(bound, np.rad2deg(np.hypot(np.deg2rad(height), width)))
+    return float(bound)
+
+
+def patch_indices(sun_vectors, subdivisions=1):
+    """Patch number of every sun vector; vectors at or below the horizon get -1."""
+    sun_vectors = np.asarray(sun_vectors, dtype=float).reshape(-1, 3)
+    norms = np.linalg.norm(sun_vectors, axis=1)
+    altitude = np.rad2deg(np.arcsin(np.clip(sun_vectors[:, 2] / np.where(norms > 0, norms, 1), -1, 1)))
+    azimuth = np.rad2deg(np.arctan2(sun_vectors[:, 0], sun_vectors[:, 1])) % 360.0
+
+    layout = patch_layout(subdivisions)
+    lows = np.array([low for low, _, _ in layout])
+    counts = np.array([count for _, _, count in layout])
+    first_patch = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    row = np.clip(np.searchsorted(lows, altitude, side='right') - 1, 0, len(layout) - 1)
+    width = 360.0 / counts[row]
+    # Patches are centered on north, so the first one straddles azimuth 0
+    column = np.floor((azimuth + width / 2) / width).astype(int) % counts[row]
+    patches = first_patch[row] + column
+    patches[sun_vectors[:, 2] <= 0] = -1
+    return patches
+
+
+class SkyBinning(object):
+    """Representative sun vectors of occupied patches with their weights and angular error."""
+
+    def __init__(self, vectors, weights, patches, max_error, error_bound):
+        self.vectors = vectors
+        self.weights = weights
+        self.patches = patches
+        self.max_error = max_error
+        self.error_bound = error_bound
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def report(self):
+        return ("Binned sun positions into {0} sky patches; largest angular error {1:.2f} degrees "
+                "(patch bound {2:.2f})".format(len(self), self.max_error, self.error_bound))
+
+
+def bin_sun_vectors(sun_vectors, subdivisions=1, weights=None):
+    """Collapse sun vectors into one weighted direction per occupied sky patch.
+
+    weights default to one per vector, so patch weights count hours (or samples);
+    pass per-vector irradiance to weight by energy instead. Each patch is
+    represented by the weighted mean of its unit vectors, and max_error is the
+    largest angle between any input vector and its representative. Vectors at or
+    below the horizon are dropped, as they light nothing.
+    """
+    sun_vectors = np.asarray(sun_vectors, dtype=float).reshape(-1, 3)
+    weights = np.ones(len(sun_vectors)) if weights is None else np.asarray(weights, dtype=float)
+    patches = patch_indices(sun_vectors, subdivisions)
+    above = patches >= 0
+    units = sun_vectors[above] / np.linalg.norm(sun_vectors[above], axis=1)[:, None]
+    occupied, members = np.unique(patches[above], return_inverse=True)
+
+    patch_weights = np.bincount(members, weights=weights[above], minlength=len(occupied))
+    # Mean direction uses unit weights where a weight is zero, so empty-energy patches keep a direction
+    direction_weights = np.where(weights[above] > 0, weights[above], 1.0)
+    sums = np.stack([np.bincount(members, weights=units[:, axis] * direction_weights, minlength=len(occupied))
+                     for axis in range(3)], axis=1)
+    vectors = sums / np.linalg.norm(sums, axis=1)[:, None]
+
+    cosines = np.clip(np.einsum('ij,ij->i', units, vectors[members]), -1, 1)
+    max_error = float(np.rad2deg(np.arccos(cosines)).max()) if len(cosines) else 0.0
+    return SkyBinning(vectors, patch_weights, occupied, max_error, patch_error_bound(subdivisions))
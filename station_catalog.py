@@ -0,0 +1,145 @@
+"""Weather station catalogue parsed from onebuilding.org KML placemark files.
+
+The KML is streamed with iterparse, keeping only name, latitude, longitude and
+the EPW download URL of each placemark in arrays. Nearest-station lookups use a
+vectorized haversine distance over all stations at once, for one site or a
+batch; on the scale of station spacing the spherical approximation ranks
+stations the same as a geodesic.
+"""
+import io
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+_URL_PATTERN = re.compile(r'URL\s*(.*?)</td>', re.IGNORECASE | re.DOTALL)
+# Stations compared per query chunk in batch lookups, bounding the distance matrix
+_QUERY_CHUNK = 256
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees; broadcasts like NumPy."""
+    lat1, lon1, lat2, lon2 = (np.deg2rad(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class StationCatalog(object):
+    """Station names, coordinates and EPW URLs held as parallel arrays."""
+
+    def __init__(self, names, lats, lons, urls):
+        self.names = np.asarray(names, dtype=str)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.urls = np.asarray(urls, dtype=str)
+
+    def __len__(self):
+        return len(self.lats)
+
+    @classmethod
+    def from_kml(cls, source):
+        """Stream placemarks from a KML file path, file object or bytes.
+
+        Placemarks without coordinates are skipped; those without a URL keep an
+        empty string so they can still be reported.
+        """
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        names, lats, lons, urls = [], [], [], []
+        for _, element in ET.iterparse(source, events=('end',)):
+            if _local_name(element.tag) != 'Placemark':
+                continue
+            name = description = coordinates = None
+            for child in element.iter():
+                tag = _local_name(child.tag)
+                if tag == 'name' and name is None:
+                    name = child.text
+                elif tag == 'description' and description is None:
+                    description = child.text
+                elif tag == 'coordinates' and coordinates is None:
+                    coordinates = child.text
+            element.clear()
+            parts = (coordinates or '').strip().split(',')
+            if len(parts) < 2:
+                continue
+            try:
+                lon, lat = float(parts[0]), float(parts[1])
+            except ValueError:
+                continue
+            url_match = _URL_PATTERN.search(description) if description else None
+            names.append(name or "Unknown")
+            lats.append(lat)
+            lons.append(lon)
+            urls.append(url_match.group(1).strip() if url_match else "")
+        return cls(names, lats, lons, urls)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['name'].to_numpy(), df['lat'].to_numpy(), df['lon'].to_numpy(), df['url'].to_numpy())
+
+    def to_frame(self):
+        return pd.DataFrame({'name': self.names, 'lat': self.lats, 'lon': self.lons, 'url': self.urls})
+
+    def save(self, path):
+        np.savez(path, names=self.names, lats=self.lats, lons=self.lons, urls=self.urls)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['names'], data['lats'], data['lons'], data['urls'])
+
+    def nearest_many(self, lats, lons, require_url=True):
+        """(station indices, distances in km) of the nearest station to each query point.
+
+        With require_url, stations without an EPW URL are never returned.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        candidates = np.flatnonzero(self.urls != "") if require_url else np.arange(len(self))
+        if not len(candidates):
+            raise Exception("The station catalogue has no stations to choose from")
+        indices = np.empty(len(lats), dtype=np.int64)
+        distances = np.empty(len(lats))
+        for start in range(0, len(lats), _QUERY_CHUNK):
+            stop = start + _QUERY_CHUNK
+            d = haversine_km(lats[start:stop, None], lons[start:stop, None], self.lats[candidates], self.lons[candidates])
+            best = d.argmin(axis=1)
+            indices[start:stop] = candidates[best]
+            distances[start:stop] = d[np.arange(len(best)), best]
+        return indices, distances
+
+    def station(self, index):
+        """Placemark-style dict for one station, with url None when it has none."""
+        return {'name': str(self.names[index]), 'lat': float(self.lats[index]), 'lon': float(self.lons[index]),
+                'url': str(self.urls[index]) or None}
+
+    def nearest(self, lat, lon, require_url=True):
+        """Station dict (name, lat, lon, url, distance_km) nearest to one point."""
+        indices, distances = self.nearest_many([lat], [lon], require_url)
+        station = self.station(indices[0])
+        station['distance_km'] = float(distances[0])
+        return station
+
+
+def load_station_catalog(kml_url, cache=None, fetch=None):
+    """Catalogue for kml_url, parsed once and then served from the WeatherCache.
+
+    fetch(url) returns the raw KML bytes on a cache miss; it defaults to
+    cache.fetch, which also honours the cache's offline mode and fixtures.
+    """
+    key = kml_url + '#stations'
+    if cache is not None:
+        df = cache.get_frame(key)
+        if df is not None:
+            return StationCatalog.from_frame(df)
+    fetch = fetch or cache.fetch
+    catalog = StationCatalog.from_kml(fetch(kml_url))
+    if cache is not None:
+        cache.put_frame(key, catalog.to_frame())
+    return catalog
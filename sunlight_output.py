@@ -0,0 +1,144 @@
+"""Binary output of voxel sunlight results: .npz arrays and coloured .3dm point clouds.
+
+Results are written in fixed-size chunks, so temporaries for colors, model
+coordinates and file buffers stay bounded regardless of grid size. The .npz
+members are streamed straight into the archive and load with np.load as usual.
+A .3dm file is only written once complete, so its point clouds stay in memory
+until then; points_per_file splits large results across several files.
+"""
+import os
+import zipfile
+
+import numpy as np
+
+from colormap import LookupColormap, VIRIDIS
+from voxel_grid import BrickGrid, SparseVoxelValues
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def gather_results(voxel_grid, sunlight_hours):
+    """(N, 3) indices and (N,) hours of every occupied voxel, gathered with array masks."""
+    if isinstance(sunlight_hours, SparseVoxelValues):
+        return sunlight_hours.indices, sunlight_hours.values
+    if isinstance(voxel_grid, BrickGrid):
+        indices = voxel_grid.occupied_indices()
+        return indices, np.asarray(sunlight_hours)[tuple(indices.T)]
+    occupied = np.asarray(voxel_grid, dtype=bool)
+    return np.argwhere(occupied), np.asarray(sunlight_hours)[occupied]
+
+
+def _chunks(count, chunk_size):
+    for start in range(0, count, chunk_size):
+        yield start, min(start + chunk_size, count)
+
+
+def _write_npz_member(archive, name, array, chunk_size):
+    """Stream one array into an open zip archive as <name>.npy, chunk by chunk along axis 0."""
+    array = np.asarray(array)
+    header = {'descr': np.lib.format.dtype_to_descr(array.dtype), 'fortran_order': False, 'shape': array.shape}
+    with archive.open(name + '.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array_header_2_0(f, header)
+        if array.ndim == 0:
+            f.write(array.tobytes())
+            return
+        for start, stop in _chunks(len(array), chunk_size):
+            f.write(np.ascontiguousarray(array[start:stop]).tobytes())
+
+
+def facade_aggregates(indices, hours, facade_boxes, origin, voxel_size=1.0):
+    """Voxel count and min/mean/max hours per facade, for voxels inside each facade's bounding box.
+
+    facade_boxes is an (F, 2, 3) array of model-space (min, max) corners. Voxels
+    are sorted by x once, so each facade only scans its own x slab.
+    """
+    facade_boxes = np.asarray(facade_boxes, dtype=float).reshape(-1, 2, 3)
+    count = np.zeros(len(facade_boxes), dtype=np.int64)
+    stats = np.full((len(facade_boxes), 3), np.nan)
+    order = np.argsort(indices[:, 0], kind='stable')
+    sorted_x = indices[order, 0]
+    # Voxel index ranges covered by each box, with half a voxel of slack for boundary voxels
+    low = np.floor((facade_boxes[:, 0] - origin) / voxel_size - 0.5).astype(np.int64)
+    high = np.ceil((facade_boxes[:, 1] - origin) / voxel_size - 0.5).astype(np.int64)
+    for f in range(len(facade_boxes)):
+        slab = order[np.searchsorted(sorted_x, low[f, 0], 'left'):np.searchsorted(sorted_x, high[f, 0], 'right')]
+        inside = slab[np.all((indices[slab, 1:] >= low[f, 1:]) & (indices[slab, 1:] <= high[f, 1:]), axis=1)]
+        count[f] = len(inside)
+        if len(inside):
+            values = hours[inside]
+            stats[f] = values.min(), values.mean(), values.max()
+    return count, stats
+
+
+def write_npz(path, indices, hours, origin, voxel_size=1.0, facade_stats=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write indices, hours, origin and voxel_size (plus facade_count/facade_stats if given) to path."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+        _write_npz_member(archive, 'indices', indices, chunk_size)
+        _write_npz_member(archive, 'hours', hours, chunk_size)
+        _write_npz_member(archive, 'origin', np.asarray(origin, dtype=float), chunk_size)
+        _write_npz_member(archive, 'voxel_size', np.asarray(voxel_size, dtype=float), chunk_size)
+        if facade_stats is not None:
+            _write_npz_member(archive, 'facade_count', facade_stats[0], chunk_size)
+            _write_npz_member(archive, 'facade_stats', facade_stats[1], chunk_size)
+
+
+def _point_cloud(rg, centers, colors):
+    """One rhino3dm PointCloud, filled with a single AddRange call where rhino3dm provides it."""
+    cloud = rg.PointCloud()
+    points = [rg.Point3d(x, y, z) for x, y, z in centers.tolist()]
+    colors = [(r, g, b, 255) for r, g, b in colors.tolist()]
+    if hasattr(cloud, 'AddRange'):
+        cloud.AddRange(points, colors)
+    else:
+        for point, color in zip(points, colors):
+            cloud.Add(point, color)
+    return cloud
+
+
+def write_point_cloud_3dm(path, indices, hours, origin, voxel_size=1.0, layer_name="Sunlight_Hours",
+                          chunk_size=DEFAULT_CHUNK_SIZE, color_map=None, points_per_file=None):
+    """Write voxel centers as vertex-coloured point clouds, one object per chunk; returns the paths written.
+
+    rhino3dm keeps every object of a File3dm in memory until it is written, so
+    peak memory grows with the points per file: about 100 bytes per point for
+    the native cloud plus one chunk of Python temporaries. points_per_file
+    (rounded up to whole chunks) bounds it by writing <path stem>_000.3dm,
+    _001.3dm and so on instead of a single file; None writes everything to path.
+    """
+    import rhino3dm as rg
+
+    color_map = color_map or LookupColormap(VIRIDIS)
+    max_hours = float(hours.max()) if len(hours) else 0.0
+    origin = np.asarray(origin, dtype=float)
+    chunks_per_file = max(1, -(-points_per_file // chunk_size)) if points_per_file else None
+    stem, extension = os.path.splitext(path)
+    paths = []
+
+    def new_model():
+        model = rg.File3dm()
+        layer = rg.Layer()
+        layer.Name = layer_name
+        attributes = rg.ObjectAttributes()
+        attributes.LayerIndex = model.Layers.Add(layer)
+        return model, attributes
+
+    def write(model):
+        file_path = path if chunks_per_file is None else "{0}_{1:03d}{2}".format(stem, len(paths), extension)
+        model.Write(file_path, 7)
+        paths.append(file_path)
+
+    model, attributes = new_model()
+    in_model = 0
+    for start, stop in _chunks(len(hours), chunk_size):
+        centers = origin + (indices[start:stop] + 0.5) * voxel_size
+        # Hours scale from 0 to the overall maximum, the same in every chunk
+        colors = color_map.rgb_array(hours[start:stop], value_range=(0.0, max_hours))
+        model.Objects.AddPointCloud(_point_cloud(rg, centers, colors), attributes)
+        in_model += 1
+        if chunks_per_file is not None and in_model == chunks_per_file:
+            write(model)
+            model, attributes = new_model()
+            in_model = 0
+    if in_model or not paths:
+        write(model)
+    return paths
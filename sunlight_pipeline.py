@@ -0,0 +1,213 @@
+"""Geometry and weather stages of the voxel sunlight pipeline, importable without Rhino.
+
+Turns rhino3dm building geometry into a BrickGrid (collect_raster_inputs,
+rasterize, voxelize_buildings) and EPW weather files into sun vectors
+(download_and_extract, extract_sun_positions). SunOnFacadesViaVoxels runs them
+end to end; run_benchmarks times them directly. rhino3dm is only needed by the
+functions that read or inspect rhino3dm geometry, so voxelize_raster_inputs
+and the weather stages work without it.
+"""
+import hashlib
+import io
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+import requests
+
+from solar_position import epw_sun_positions, parse_epw_location
+from voxel_grid import BrickGrid
+from voxel_raster import closed_mesh_voxels, polygon_triangles, prism_voxels, segment_voxels, triangle_voxels
+
+try:
+    import rhino3dm as rg
+except ImportError:
+    rg = None  # only extract_building_facades and collect_raster_inputs need it
+
+
+def download_and_extract(url, cache=None):
+    """EPW weather file from a zipped download as a DataFrame, with the header location in df.attrs['location']."""
+    if cache is not None:
+        df = cache.get_frame(url)
+        if df is not None:
+            return df
+        content = cache.fetch(url)
+    else:
+        content = requests.get(url).content
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_ref:
+        epw_file = [file for file in zip_ref.namelist() if file.endswith('.epw')][0]
+        with zip_ref.open(epw_file) as f:
+            location = parse_epw_location(f.readline().decode('latin-1'))
+            f.seek(0)
+            df = pd.read_csv(f, header=None, names=[
+                'Year', 'Month', 'Day', 'Hour', 'Minute', 'Data Source and Uncertainty Flags',
+                'Dry Bulb Temperature', 'Dew Point Temperature', 'Relative Humidity',
+                'Atmospheric Station Pressure', 'Extraterrestrial Horizontal Radiation',
+                'Extraterrestrial Direct Normal Radiation', 'Horizontal Infrared Radiation Intensity',
+                'Global Horizontal Radiation', 'Direct Normal Radiation', 'Diffuse Horizontal Radiation',
+                'Global Horizontal Illuminance', 'Direct Normal Illuminance', 'Diffuse Horizontal Illuminance',
+                'Zenith Luminance', 'Wind Direction', 'Wind Speed', 'Total Sky Cover',
+                'Opaque Sky Cover', 'Visibility', 'Ceiling Height', 'Present Weather Observation',
+                'Present Weather Codes', 'Precipitable Water', 'Aerosol Optical Depth',
+                'Snow Depth', 'Days Since Last Snowfall', 'Albedo', 'Liquid Precipitation Depth',
+                'Liquid Precipitation Quantity'
+            ], skiprows=8)
+            df.attrs['location'] = location
+    if cache is not None:
+        cache.put_frame(url, df)
+    return df
+
+
+def extract_sun_positions(df, month, start_day, end_day, end_month=None, samples_per_hour=1):
+    """Extract sun positions (azimuth and altitude) from EPW data for the given date range.
+
+    The range runs from (month, start_day) to (end_month, end_day), both inclusive;
+    end_month defaults to month. Positions are computed from the EPW location
+    header and returned as an (N, 3) array of above-horizon sun vectors.
+    """
+    end_month = month if end_month is None else end_month
+    date_key = df['Month'].to_numpy() * 100 + df['Day'].to_numpy()
+    selected = (date_key >= month * 100 + start_day) & (date_key <= end_month * 100 + end_day)
+    return epw_sun_positions(df['Month'].to_numpy()[selected], df['Day'].to_numpy()[selected],
+                             df['Hour'].to_numpy()[selected], df.attrs['location'], samples_per_hour=samples_per_hour)
+
+
+def extract_building_facades(filepath, layer_name="Building_Facade", with_ids=False):
+    """Facade geometries (curves, meshes, extrusions and breps) on layer_name, or (object id, geometry) pairs when with_ids is set."""
+    model = rg.File3dm.Read(filepath)
+    facades = []
+    for obj in model.Objects:
+        if model.Layers[obj.Attributes.LayerIndex].Name == layer_name:
+            geom = obj.Geometry
+            if isinstance(geom, (rg.Curve, rg.Mesh, rg.Extrusion, rg.Brep)):
+                facades.append((str(obj.Attributes.Id), geom) if with_ids else geom)
+    if not facades:
+        raise Exception(f"No facades found in the '{layer_name}' layer.")
+    return facades
+
+
+def curve_points(curve, samples=32):
+    """Vertices of a polyline curve, or evenly spaced samples along any other curve."""
+    if isinstance(curve, rg.PolylineCurve):
+        return np.array([[pt.X, pt.Y, pt.Z] for pt in (curve.Point(i) for i in range(curve.PointCount))])
+    domain = curve.Domain
+    return np.array([[pt.X, pt.Y, pt.Z] for pt in (curve.PointAt(t) for t in np.linspace(domain.T0, domain.T1, samples + 1))])
+
+
+def mesh_triangles(mesh):
+    """(T, 3, 3) triangle corners of a mesh, with quads split in two."""
+    vertices = np.array([[v.X, v.Y, v.Z] for v in mesh.Vertices])
+    faces = np.array([tuple(mesh.Faces[i]) for i in range(len(mesh.Faces))]).reshape(-1, 4)
+    quads = faces[faces[:, 2] != faces[:, 3]]
+    triangles = np.concatenate([faces[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    return vertices[triangles]
+
+
+def collect_raster_inputs(building_geometries):
+    """Split building geometry into edge segments, extruded footprints and triangle meshes.
+
+    Closed planar curves are triangulated into open meshes; other curves become segments.
+    """
+    segments, footprints, closed_meshes, open_meshes = [], [], [], []
+    for geom in building_geometries:
+        if isinstance(geom, rg.Extrusion) and geom.IsCappedAtBottom and geom.IsCappedAtTop:
+            ring = curve_points(geom.Profile3d(0, 0.0))
+            footprints.append((ring, geom.PathStart.Z, geom.PathEnd.Z))
+            continue
+        if isinstance(geom, rg.Extrusion):
+            geom = geom.ToBrep(False)
+        if isinstance(geom, rg.Brep):
+            face_meshes = [face.GetMesh(rg.MeshType.Any) for face in geom.Faces]
+            triangles = [mesh_triangles(mesh) for mesh in face_meshes if mesh is not None]
+            if triangles:
+                (closed_meshes if geom.IsSolid else open_meshes).append(np.concatenate(triangles))
+            else:
+                # No cached render mesh in the file; fall back to the brep's edges
+                for edge in geom.Edges:
+                    points = curve_points(edge)
+                    segments.append(np.stack([points[:-1], points[1:]], axis=1))
+        elif isinstance(geom, rg.Mesh):
+            (closed_meshes if geom.IsClosed else open_meshes).append(mesh_triangles(geom))
+        elif isinstance(geom, rg.Curve) and geom.IsClosed and geom.IsPlanar():
+            # A closed planar outline is a surface (slab, wall or roof), not just its edges
+            triangles = polygon_triangles(curve_points(geom))
+            if len(triangles):
+                open_meshes.append(triangles)
+        elif isinstance(geom, rg.Curve):
+            points = curve_points(geom)
+            segments.append(np.stack([points[:-1], points[1:]], axis=1) if len(points) > 1 else np.stack([points, points], axis=1))
+    segments = np.concatenate(segments) if segments else np.zeros((0, 2, 3))
+    return segments, footprints, closed_meshes, open_meshes
+
+
+def raster_bounds(raster_inputs):
+    """Model-space (min, max) corners of everything collect_raster_inputs returned."""
+    segments, footprints, closed_meshes, open_meshes = raster_inputs
+    all_points = [segments.reshape(-1, 3)] + [triangles.reshape(-1, 3) for triangles in closed_meshes + open_meshes]
+    for ring, z_bottom, z_top in footprints:
+        all_points.append(np.column_stack([ring[:, :2], np.full(len(ring), z_bottom)]))
+        all_points.append(np.column_stack([ring[:, :2], np.full(len(ring), z_top)]))
+    all_points = np.concatenate(all_points)
+    return all_points.min(axis=0), all_points.max(axis=0)
+
+
+def rasterize(raster_inputs, origin, grid_shape, voxel_size=1.0, clip=True):
+    """Yield chunks of voxel indices covered by the raster inputs, clipped to grid_shape unless clip is False."""
+    segments, footprints, closed_meshes, open_meshes = raster_inputs
+
+    def to_voxel(points):
+        return (points - origin) / voxel_size
+
+    stages = [segment_voxels(to_voxel(segments[:, 0]), to_voxel(segments[:, 1]))]
+    if footprints:
+        stages.append(prism_voxels([to_voxel(np.column_stack([ring[:, :2], np.zeros(len(ring))]))[:, :2] for ring, _, _ in footprints],
+                                   [(z_bottom - origin[2]) / voxel_size for _, z_bottom, _ in footprints],
+                                   [(z_top - origin[2]) / voxel_size for _, _, z_top in footprints]))
+    stages.append(closed_mesh_voxels([to_voxel(triangles) for triangles in closed_meshes]))
+    stages.append(triangle_voxels(to_voxel(np.concatenate(open_meshes)) if open_meshes else np.zeros((0, 3, 3))))
+
+    upper = np.array(grid_shape) - 1
+    for stage in stages:
+        for voxel_indices in stage:
+            yield np.clip(voxel_indices, 0, upper) if clip else voxel_indices
+
+
+def voxelize_raster_inputs(raster_inputs, voxel_size=1.0, brick_size=32):
+    """Rasterize collect_raster_inputs output into a BrickGrid over its bounding box.
+
+    Returns (grid, bbox_min, bbox_max). Facade edges are traced with a 3D DDA,
+    capped extrusions are filled column by column from their footprints, closed
+    meshes are filled by scanline parity and open meshes are voxelized
+    conservatively; each stage runs over all buildings at once.
+    """
+    bbox_min, bbox_max = raster_bounds(raster_inputs)
+    # Points on the max face need their own voxel
+    grid_shape = np.floor((bbox_max - bbox_min) / voxel_size).astype(int) + 1
+    # Bricks are only allocated where buildings are
+    grid = BrickGrid(grid_shape, brick_size)
+    for voxel_indices in rasterize(raster_inputs, bbox_min, grid_shape, voxel_size):
+        grid.add(voxel_indices)
+    return grid, bbox_min, bbox_max
+
+
+def voxelize_buildings(building_geometries, voxel_size=1.0, brick_size=32):
+    """Voxelize all rhino3dm buildings into a single sparse BrickGrid; see voxelize_raster_inputs."""
+    return voxelize_raster_inputs(collect_raster_inputs(building_geometries), voxel_size, brick_size)
+
+
+def geometry_hash(geom):
+    """Content hash of a rhino3dm geometry, stable across file saves."""
+    return hashlib.sha1(json.dumps(geom.Encode(), sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def voxelize_each(buildings, origin, grid_shape, voxel_size=1.0):
+    """{id: unique (N, 3) voxel indices} for (id, geometry) pairs, on the grid at origin.
+
+    Voxels are not clipped, so callers can tell when a building leaves the grid.
+    """
+    voxels = {}
+    for building_id, geom in buildings:
+        chunks = list(rasterize(collect_raster_inputs([geom]), origin, grid_shape, voxel_size, clip=False))
+        voxels[building_id] = np.unique(np.concatenate(chunks), axis=0) if chunks else np.zeros((0, 3), dtype=np.int64)
+    return voxels
@@ -0,0 +1,74 @@
+"""Seeded synthetic city blocks for benchmarks and pipeline tests.
+
+Lots are drawn from the low, medium and high density types of
+CreateLowMedHighDensityBldgs with randomized FAR and floor counts, massed with
+massing.generate_massing, and written as a .3dm (through rhino3dm) plus a
+parcel CSV in the format parcel_loader reads.
+"""
+import csv
+import json
+
+import numpy as np
+
+from massing import LOT_DEFAULTS, generate_massing
+
+# (style, lot width, lot length, FAR range, floor range) per density type
+LOT_TYPES = [
+    ('low', 25.0, 95.0, (0.5, 1.2), (1, 2)),
+    ('pyramid', 40.0, 95.0, (1.5, 3.0), (3, 6)),
+    ('inverted_pyramid', 40.0, 95.0, (1.5, 3.0), (3, 6)),
+    ('tapered', 100.0, 95.0, (4.0, 9.0), (4, 12)),
+]
+
+
+class SyntheticCity(object):
+    """Lots, their floor plates and one equity multiple per lot."""
+
+    def __init__(self, lots, plates, values):
+        self.lots = lots
+        self.plates = plates
+        self.values = values
+
+    def plate_boxes(self):
+        """(P, 2, 3) min and max corners of every floor plate."""
+        p = self.plates
+        low = np.column_stack([p.x, p.y, p.z])
+        return np.stack([low, low + np.column_stack([p.width, p.depth, p.height])], axis=1)
+
+    def building_points(self):
+        """(B, 2) ground-floor plate centers, one per lot that has a building."""
+        p = self.plates
+        ground = np.asarray(p.z) == 0
+        return np.column_stack([np.asarray(p.x)[ground] + np.asarray(p.width)[ground] / 2,
+                                np.asarray(p.y)[ground] + np.asarray(p.depth)[ground] / 2])
+
+
+def generate_city(n_buildings, seed=0, spacing=20.0):
+    """A reproducible block of n_buildings lots laid out on a square grid."""
+    rng = np.random.default_rng(seed)
+    lots = []
+    for type_index in rng.integers(0, len(LOT_TYPES), n_buildings):
+        style, width, length, (far_low, far_high), (floors_low, floors_high) = LOT_TYPES[type_index]
+        lot = dict(LOT_DEFAULTS)
+        lot.update(style=style, width=width, length=length, far=round(float(rng.uniform(far_low, far_high)), 2),
+                   num_floors=int(rng.integers(floors_low, floors_high + 1)))
+        lots.append(lot)
+    plates, _ = generate_massing(lots, spacing)
+    return SyntheticCity(lots, plates, rng.lognormal(0.0, 0.5, n_buildings))
+
+
+def write_parcel_csv(city, path, value_field='equity_multiple_mean'):
+    """One row per lot with a GeoJSON Polygon outline and a value column."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['parcel_id', value_field, 'geometry'])
+        for i, (lot, value) in enumerate(zip(city.lots, city.values)):
+            x, y, w, l = lot['x'], lot['y'], lot['width'], lot['length']
+            ring = [[x, y], [x + w, y], [x + w, y + l], [x, y + l], [x, y]]
+            writer.writerow([i, "{0:.4f}".format(value), json.dumps({'type': 'Polygon', 'coordinates': [ring]})])
+
+
+def write_city_3dm(city, path):
+    """Write lot outlines and floor-plate boxes to path; needs rhino3dm."""
+    from headless_massing_export import write_massing_3dm
+    write_massing_3dm(city.lots, city.plates, path)
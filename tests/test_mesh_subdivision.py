@@ -0,0 +1,50 @@
+from mesh_subdivision import face_area, refine_to_target
+
+
+def _on_open_segment(p, a, b, tolerance=1e-9):
+    ab = [b[i] - a[i] for i in range(3)]
+    ap = [p[i] - a[i] for i in range(3)]
+    cross = (ab[1] * ap[2] - ab[2] * ap[1], ab[2] * ap[0] - ab[0] * ap[2], ab[0] * ap[1] - ab[1] * ap[0])
+    if sum(c * c for c in cross) > tolerance:
+        return False
+    t = sum(ab[i] * ap[i] for i in range(3)) / sum(c * c for c in ab)
+    return tolerance < t < 1 - tolerance
+
+
+def _t_junctions(vertices, faces):
+    """(edge, vertex) pairs where a mesh vertex sits inside another face's edge."""
+    used = sorted(set(i for face in faces for i in face))
+    edges = set()
+    for face in faces:
+        for i in range(len(face)):
+            a, b = face[i], face[(i + 1) % len(face)]
+            edges.add((min(a, b), max(a, b)))
+    return [((a, b), v) for a, b in edges for v in used
+            if v not in (a, b) and _on_open_segment(vertices[v], vertices[a], vertices[b])]
+
+
+def _mixed_strip():
+    """A strip of quads of very different widths with a triangle fan on top, so only some faces split."""
+    xs = [0.0, 8.0, 9.0, 10.0, 18.0]
+    vertices = [(x, 0.0, 0.0) for x in xs] + [(x, 1.0, 0.0) for x in xs] + [(9.0, 5.0, 0.0)]
+    n = len(xs)
+    faces = [(i, i + 1, n + i + 1, n + i) for i in range(n - 1)]
+    faces += [(n + i, n + i + 1, 2 * n) for i in range(n - 1)]
+    return vertices, faces
+
+
+def test_refine_to_target_leaves_no_t_junctions():
+    vertices, faces = _mixed_strip()
+    total_area = sum(face_area(face, vertices) for face in faces)
+    for target in (6.0, 3.0, 1.5):
+        new_vertices, new_faces, levels = refine_to_target(vertices, faces, target_edge_length=target)
+        assert levels > 0
+        assert _t_junctions(new_vertices, new_faces) == []
+        assert abs(sum(face_area(face, new_vertices) for face in new_faces) - total_area) < 1e-9
+
+
+def test_refine_to_target_by_area_leaves_no_t_junctions():
+    vertices, faces = _mixed_strip()
+    new_vertices, new_faces, _ = refine_to_target(vertices, faces, target_area=2.0)
+    assert all(face_area(face, new_vertices) <= 2.0 for face in new_faces)
+    assert _t_junctions(new_vertices, new_faces) == []
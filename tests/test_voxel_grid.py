@@ -0,0 +1,51 @@
+import numpy as np
+
+from voxel_grid import BrickGrid
+
+
+def _dense_surface(dense):
+    padded = np.pad(dense, 1)
+    enclosed = np.ones(dense.shape, dtype=bool)
+    for axis in range(3):
+        for step in (-1, 1):
+            enclosed &= np.roll(padded, step, axis=axis)[1:-1, 1:-1, 1:-1]
+    return dense & ~enclosed
+
+
+def _random_grid(shape, brick_size, density, seed):
+    rng = np.random.default_rng(seed)
+    dense = rng.random(shape) < density
+    grid = BrickGrid(shape, brick_size)
+    points = np.argwhere(dense)
+    rng.shuffle(points)
+    for part in np.array_split(points, 5):
+        grid.add(part)
+    return grid, dense
+
+
+def test_surface_and_extent_match_dense_grid():
+    for brick_size, density in ((4, 0.7), (8, 0.3), (32, 0.9)):
+        grid, dense = _random_grid((21, 35, 13), brick_size, density, seed=brick_size)
+        surface = np.zeros(dense.shape, dtype=bool)
+        for chunk in grid.surface_chunks():
+            surface[tuple(chunk.T)] = True
+        assert np.array_equal(surface, _dense_surface(dense))
+        occupied = np.argwhere(dense)
+        assert grid.extent() == list(zip(occupied.min(axis=0).tolist(), occupied.max(axis=0).tolist()))
+        assert grid.count() == dense.sum()
+        assert np.array_equal(grid.to_dense(), dense)
+
+
+def test_bricks_grow_geometrically_and_save_only_used_rows(tmp_path):
+    grid = BrickGrid((64, 64, 64), brick_size=4)
+    capacities = set()
+    for i in range(16):
+        for j in range(16):
+            grid.add([[4 * i, 4 * j, 0]])
+            capacities.add(len(grid._bricks))
+    assert grid.brick_count == 256
+    assert len(capacities) <= 5
+    grid.save(str(tmp_path))
+    loaded = BrickGrid.load(str(tmp_path), mmap_mode='r')
+    assert loaded.brick_count == 256
+    assert np.array_equal(loaded.occupied_indices(), grid.occupied_indices())
@@ -0,0 +1,62 @@
+import numpy as np
+
+from voxel_raster import _triangle_box_overlap, polygon_triangles, triangle_voxels
+from voxel_shadows import cast_shadow
+
+
+def _wall(start, end, z_bottom, z_top):
+    a = [start[0], start[1], z_bottom]
+    b = [end[0], end[1], z_bottom]
+    c = [end[0], end[1], z_top]
+    d = [start[0], start[1], z_top]
+    return np.array([[a, b, c], [a, c, d]], dtype=float)
+
+
+def _dense(triangles, shape):
+    grid = np.zeros(shape, dtype=bool)
+    for voxels in triangle_voxels(triangles):
+        grid[tuple(voxels.T)] = True
+    return grid
+
+
+def test_tilted_open_wall_is_watertight():
+    # A single-sheet wall along x == y, with the sun crossing it diagonally
+    grid = _dense(_wall((4.0, 4.0), (40.0, 40.0), 0.5, 20.5), (48, 48, 24))
+    shadow = cast_shadow(grid, np.array([1.0, -1.0, 0.05]))
+
+    i, j, k = np.indices(grid.shape)
+    steps = (j - i) / 2.0  # ray steps to reach the wall plane
+    crossing = (i + j) / 2.0
+    behind = (j - i >= 2) & (crossing >= 6) & (crossing <= 38) & (k >= 1) & (k + 0.05 * steps <= 19)
+    assert behind.sum() > 0
+    assert shadow[behind].all()
+
+
+def test_triangle_voxels_matches_brute_force_overlap():
+    rng = np.random.default_rng(0)
+    triangles = rng.uniform(0, 12, (100, 3, 3))
+    found = set(map(tuple, np.concatenate(list(triangle_voxels(triangles, chunk_size=5000)))))
+
+    expected = set()
+    for triangle in triangles:
+        low = np.floor(triangle.min(axis=0)).astype(int)
+        high = np.floor(triangle.max(axis=0)).astype(int)
+        cells = np.stack(np.meshgrid(*[np.arange(l, h + 1) for l, h in zip(low, high)], indexing='ij'), -1).reshape(-1, 3)
+        corners = [np.repeat(triangle[None, n], len(cells), axis=0) for n in range(3)]
+        expected |= set(map(tuple, cells[_triangle_box_overlap(corners[0], corners[1], corners[2], cells)]))
+    assert found == expected
+
+
+def test_degenerate_triangle_traces_its_edges():
+    triangle = np.array([[[0.5, 0.5, 0.5], [3.5, 0.5, 0.5], [1.5, 0.5, 0.5]]])
+    voxels = np.concatenate(list(triangle_voxels(triangle)))
+    assert set(map(tuple, voxels)) == {(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)}
+
+
+def test_polygon_triangles_covers_a_concave_ring():
+    # An L-shaped outline standing upright in the x-z plane, closing point repeated
+    ring = np.array([[0, 0, 0], [4, 0, 0], [4, 0, 1], [1, 0, 1], [1, 0, 3], [0, 0, 3], [0, 0, 0]], dtype=float)
+    triangles = polygon_triangles(ring)
+    assert triangles.shape == (4, 3, 3)
+    area = 0.5 * np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1).sum()
+    assert np.isclose(area, 6.0)
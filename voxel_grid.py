@@ -0,0 +1,248 @@
+"""Compact voxel occupancy storage for large, mostly empty grids."""
+import os
+
+import numpy as np
+
+
+class BrickGrid(object):
+    """Bit-packed occupancy grid stored as bricks, allocated only where something is occupied.
+
+    The grid is split into cubes of brick_size**3 voxels. A small dense table over
+    the brick lattice maps each brick to a row of packed bits, or -1 when the brick
+    is empty, so memory grows with the occupied surface rather than the bounding
+    volume. Lookups are vectorized over (N, 3) index arrays. Brick rows are
+    allocated with geometric over-capacity, so filling a grid brick by brick
+    costs amortized constant copying per brick.
+    """
+
+    # Bricks unpacked at once when scanning the grid
+    scan_bricks = 64
+
+    def __init__(self, shape, brick_size=32):
+        self.shape = tuple(int(s) for s in shape)
+        self.ndim = 3
+        self.brick_size = int(brick_size)
+        table_shape = tuple(-(-s // self.brick_size) for s in self.shape)
+        self._table = np.full(table_shape, -1, dtype=np.int32)
+        self._bricks = np.zeros((0, self.brick_size ** 3 // 8), dtype=np.uint8)
+        self._used = 0
+        self._extent = None
+
+    @classmethod
+    def from_dense(cls, array, brick_size=32):
+        grid = cls(array.shape, brick_size)
+        grid.add(np.argwhere(array))
+        return grid
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        """Load a grid written by save(); mmap_mode='r' shares it between processes without copying."""
+        meta = np.load(os.path.join(directory, "meta.npy"))
+        grid = cls(meta[:3], meta[3])
+        grid._table = np.load(os.path.join(directory, "table.npy"), mmap_mode=mmap_mode)
+        grid._bricks = np.load(os.path.join(directory, "bricks.npy"), mmap_mode=mmap_mode)
+        grid._used = len(grid._bricks)
+        return grid
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "meta.npy"), np.array(self.shape + (self.brick_size,), dtype=np.int64))
+        np.save(os.path.join(directory, "table.npy"), self._table)
+        np.save(os.path.join(directory, "bricks.npy"), self._bricks[:self._used])
+
+    @property
+    def brick_count(self):
+        return self._used
+
+    @property
+    def nbytes(self):
+        return self._table.nbytes + self._bricks.nbytes
+
+    def _split(self, indices):
+        """Brick coordinates and bit positions within the brick for in-bounds indices."""
+        bs = self.brick_size
+        brick = indices // bs
+        local = indices % bs
+        linear = (local[:, 0] * bs + local[:, 1]) * bs + local[:, 2]
+        return brick, linear
+
+    def _reserve(self, count):
+        """Make room for at least count brick rows, at least doubling the capacity when growing."""
+        if count <= len(self._bricks):
+            return
+        grown = np.zeros((max(count, 2 * len(self._bricks), 16), self._bricks.shape[1]), dtype=np.uint8)
+        grown[:self._used] = self._bricks[:self._used]
+        self._bricks = grown
+
+    def _in_bounds(self, indices):
+        return np.all((indices >= 0) & (indices < np.array(self.shape)), axis=1)
+
+    def add(self, indices):
+        """Mark the voxels at an (N, 3) array of indices as occupied."""
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+        if not np.all(self._in_bounds(indices)):
+            raise IndexError("Voxel index out of bounds for grid of shape {0}".format(self.shape))
+        if not len(indices):
+            return
+        brick, linear = self._split(indices)
+
+        brick_ids = self._table[brick[:, 0], brick[:, 1], brick[:, 2]]
+        missing = brick_ids < 0
+        if np.any(missing):
+            new_bricks = np.unique(brick[missing], axis=0)
+            first_id = self._used
+            self._reserve(first_id + len(new_bricks))
+            self._table[new_bricks[:, 0], new_bricks[:, 1], new_bricks[:, 2]] = np.arange(first_id, first_id + len(new_bricks))
+            self._used += len(new_bricks)
+            brick_ids = self._table[brick[:, 0], brick[:, 1], brick[:, 2]]
+
+        bits = np.left_shift(1, linear & 7).astype(np.uint8)
+        np.bitwise_or.at(self._bricks, (brick_ids, linear >> 3), bits)
+        self._extent = None
+
+    def contains(self, indices):
+        """Occupancy of an (N, 3) array of indices; indices outside the grid are unoccupied."""
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+        result = np.zeros(len(indices), dtype=bool)
+        inside = np.flatnonzero(self._in_bounds(indices))
+        if not inside.size:
+            return result
+        brick, linear = self._split(indices[inside])
+        brick_ids = self._table[brick[:, 0], brick[:, 1], brick[:, 2]]
+        allocated = brick_ids >= 0
+        packed = self._bricks[brick_ids[allocated], linear[allocated] >> 3]
+        result[inside[allocated]] = (packed >> (linear[allocated] & 7)) & 1 == 1
+        return result
+
+    def _brick_coords(self):
+        """(B, 3) brick lattice coordinates of the allocated bricks, ordered by brick id."""
+        table = np.asarray(self._table)
+        coords = np.argwhere(table >= 0)
+        return coords[np.argsort(table[tuple(coords.T)])]
+
+    def _unpack(self, brick_ids):
+        """(n, bs, bs, bs) boolean occupancy of the given bricks."""
+        bs = self.brick_size
+        bits = np.unpackbits(np.asarray(self._bricks[brick_ids]), axis=1, bitorder='little')
+        return bits.reshape(-1, bs, bs, bs).view(bool)
+
+    def occupied_chunks(self):
+        """Yield (M, 3) indices of the occupied voxels, a few bricks at a time in brick id order."""
+        bs = self.brick_size
+        coords = self._brick_coords()
+        for start in range(0, self._used, self.scan_bricks):
+            blocks = self._unpack(np.arange(start, min(start + self.scan_bricks, self._used)))
+            brick, x, y, z = np.nonzero(blocks)
+            yield coords[start + brick] * bs + np.stack([x, y, z], axis=1)
+
+    def surface_chunks(self):
+        """Yield (M, 3) indices of occupied voxels with an empty face neighbour, a few bricks at a time.
+
+        Each batch of bricks is padded with the touching layer of its six
+        face-neighbour bricks; voxels outside the grid count as empty.
+        """
+        bs = self.brick_size
+        table = np.asarray(self._table)
+        coords = self._brick_coords()
+        for start in range(0, self._used, self.scan_bricks):
+            ids = np.arange(start, min(start + self.scan_bricks, self._used))
+            blocks = self._unpack(ids)
+            padded = np.zeros((len(ids), bs + 2, bs + 2, bs + 2), dtype=bool)
+            padded[:, 1:-1, 1:-1, 1:-1] = blocks
+            for axis in range(3):
+                for step in (-1, 1):
+                    neighbour = coords[ids]
+                    neighbour[:, axis] += step
+                    valid = np.flatnonzero((neighbour[:, axis] >= 0) & (neighbour[:, axis] < table.shape[axis]))
+                    neighbour_ids = table[tuple(neighbour[valid].T)]
+                    allocated = neighbour_ids >= 0
+                    valid, neighbour_ids = valid[allocated], neighbour_ids[allocated]
+                    if not valid.size:
+                        continue
+                    # The neighbour's layer touching this brick
+                    layer = np.take(self._unpack(neighbour_ids), bs - 1 if step < 0 else 0, axis=axis + 1)
+                    target = [valid, slice(1, -1), slice(1, -1), slice(1, -1)]
+                    target[axis + 1] = 0 if step < 0 else bs + 1
+                    padded[tuple(target)] = layer
+            enclosed = (padded[:, :-2, 1:-1, 1:-1] & padded[:, 2:, 1:-1, 1:-1] &
+                        padded[:, 1:-1, :-2, 1:-1] & padded[:, 1:-1, 2:, 1:-1] &
+                        padded[:, 1:-1, 1:-1, :-2] & padded[:, 1:-1, 1:-1, 2:])
+            brick, x, y, z = np.nonzero(blocks & ~enclosed)
+            yield coords[start + brick] * bs + np.stack([x, y, z], axis=1)
+
+    def occupied_indices(self):
+        """(M, 3) indices of every occupied voxel, ordered brick by brick."""
+        chunks = list(self.occupied_chunks())
+        return np.concatenate(chunks) if chunks else np.zeros((0, 3), dtype=np.int64)
+
+    def surface_indices(self):
+        """Occupied voxels with at least one empty face neighbour, i.e. those that can receive light."""
+        chunks = list(self.surface_chunks())
+        return np.concatenate(chunks) if chunks else np.zeros((0, 3), dtype=np.int64)
+
+    def count(self):
+        total = 0
+        for start in range(0, self._used, self.scan_bricks):
+            total += int(np.unpackbits(np.asarray(self._bricks[start:min(start + self.scan_bricks, self._used)])).sum())
+        return total
+
+    def _occupied_layers(self, brick_ids, axis):
+        """(bs,) flags of the layers along axis holding an occupied voxel in any of the given bricks."""
+        others = tuple(a + 1 for a in range(3) if a != axis)
+        layers = np.zeros(self.brick_size, dtype=bool)
+        for start in range(0, len(brick_ids), self.scan_bricks):
+            layers |= self._unpack(brick_ids[start:start + self.scan_bricks]).any(axis=(0,) + others)
+        return layers
+
+    def extent(self):
+        """Per-axis (min, max) index of occupied voxels, or None if the grid is empty.
+
+        Read from the brick table, unpacking only the outermost bricks on each side.
+        """
+        if self._extent is None:
+            coords = self._brick_coords()
+            if not len(coords):
+                return None
+            bs = self.brick_size
+            extent = []
+            for axis in range(3):
+                low, high = coords[:, axis].min(), coords[:, axis].max()
+                low_layers = self._occupied_layers(np.flatnonzero(coords[:, axis] == low), axis)
+                high_layers = self._occupied_layers(np.flatnonzero(coords[:, axis] == high), axis)
+                extent.append((int(low * bs + np.argmax(low_layers)),
+                               int(high * bs + bs - 1 - np.argmax(high_layers[::-1]))))
+            self._extent = extent
+        return self._extent
+
+    def to_dense(self):
+        dense = np.zeros(self.shape, dtype=bool)
+        for occupied in self.occupied_chunks():
+            dense[tuple(occupied.T)] = True
+        return dense
+
+    def __getitem__(self, index):
+        return bool(self.contains(np.array([index]))[0])
+
+    def __setitem__(self, index, value):
+        if not value:
+            raise ValueError("BrickGrid only supports marking voxels as occupied")
+        self.add(np.array([index]))
+
+
+class SparseVoxelValues(object):
+    """Per-voxel values held only for a set of voxel indices, e.g. sunlight hours on occupied voxels."""
+
+    def __init__(self, indices, values, shape):
+        self.indices = indices
+        self.values = values
+        self.shape = tuple(shape)
+
+    def __len__(self):
+        return len(self.values)
+
+    def max(self):
+        return self.values.max() if len(self.values) else 0
+
+    def to_dense(self, dtype=None):
+        dense = np.zeros(self.shape, dtype=dtype or self.values.dtype)
+        dense[tuple(self.indices.T)] = self.values
+        return dense
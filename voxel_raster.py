@@ -0,0 +1,341 @@
+"""Vectorized rasterization of building geometry into voxel indices.
+
+All inputs are in voxel coordinates, where voxel (i, j, k) spans [i, i + 1) along
+each axis. Every function is a generator yielding (N, 3) int64 index arrays of
+at most roughly chunk_size voxels, so callers can stream them into a grid
+without holding the whole rasterization in memory.
+"""
+import numpy as np
+
+# Offsets applied to sample centers so they never sit exactly on a shared triangle edge
+_JITTER_X = 3.1415e-5
+_JITTER_Y = 2.7183e-5
+
+
+def _batches(counts, chunk_size):
+    """Yield (start, stop) item ranges whose summed counts stay near chunk_size."""
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        base = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, base + chunk_size, side='right')), start + 1)
+        yield start, stop
+        start = stop
+
+
+def _expand(counts):
+    """Item id and within-item position of every element when item i is repeated counts[i] times."""
+    ids = np.repeat(np.arange(len(counts)), counts)
+    positions = np.arange(ids.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    return ids, positions
+
+
+def segment_voxel_counts(starts, ends):
+    """Number of voxels segment_voxels yields for each segment."""
+    starts = np.floor(np.asarray(starts, dtype=float).reshape(-1, 3))
+    ends = np.floor(np.asarray(ends, dtype=float).reshape(-1, 3))
+    return np.abs(ends - starts).astype(np.int64).sum(axis=1) + 1
+
+
+def segment_voxels(starts, ends, chunk_size=1000000):
+    """Voxels crossed by line segments (Amanatides-Woo 3D DDA), segment by segment in order.
+
+    Every crossing of an integer plane between a segment's end voxels steps to
+    the face-adjacent voxel, so the trace has no gaps and each segment yields
+    segment_voxel_counts voxels. When a segment passes exactly through an edge
+    or corner, the planes are crossed one axis at a time, adding the voxels on
+    either side rather than skipping diagonally.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+    first = np.floor(starts).astype(np.int64)
+    steps = np.floor(ends).astype(np.int64) - first
+    deltas = ends - starts
+    counts = np.abs(steps).sum(axis=1) + 1
+    for start, stop in _batches(counts, chunk_size):
+        # One event per segment for its first voxel, then one per plane crossing
+        segment_ids = [np.arange(start, stop)]
+        times = [np.full(stop - start, -1.0)]
+        axes = [np.full(stop - start, -1)]
+        for axis in range(3):
+            ids, k = _expand(np.abs(steps[start:stop, axis]))
+            ids += start
+            forward = steps[ids, axis] > 0
+            plane = first[ids, axis] + np.where(forward, k + 1, -k)
+            segment_ids.append(ids)
+            times.append((plane - starts[ids, axis]) / deltas[ids, axis])
+            axes.append(np.full(len(ids), axis))
+        segment_ids, times, axes = np.concatenate(segment_ids), np.concatenate(times), np.concatenate(axes)
+        order = np.lexsort((axes, times, segment_ids))
+        segment_ids, axes = segment_ids[order], axes[order]
+
+        # Walk the crossings: each adds a unit step along its axis, summed within its segment
+        moves = np.zeros((len(order), 3), dtype=np.int64)
+        crossing = axes >= 0
+        moves[crossing, axes[crossing]] = np.sign(steps[segment_ids[crossing], axes[crossing]])
+        walked = np.cumsum(moves, axis=0)
+        segment_first = np.cumsum(counts[start:stop]) - counts[start:stop]
+        walked -= walked[segment_first][segment_ids - start]
+        yield first[segment_ids] + walked
+
+
+def _column_voxels(columns, z_low, z_high, chunk_size):
+    """Expand (i, j) columns over the half-open voxel ranges [z_low, z_high)."""
+    counts = np.maximum(z_high - z_low, 0)
+    for start, stop in _batches(counts, chunk_size):
+        ids, positions = _expand(counts[start:stop])
+        ids += start
+        yield np.column_stack([columns[ids], z_low[ids] + positions])
+
+
+def footprint_columns(rings):
+    """(i, j) columns covered by closed 2D rings, with the index of the ring covering each.
+
+    Interior columns come from an even-odd scanline fill over voxel centers, run
+    for the edges of every ring at once; boundary columns are added from the
+    rasterized ring edges so thin footprints are never lost.
+    """
+    edge_starts, edge_ends, edge_rings = [], [], []
+    for ring_index, ring in enumerate(rings):
+        ring = np.asarray(ring, dtype=float)[:, :2]
+        if np.allclose(ring[0], ring[-1]):
+            ring = ring[:-1]
+        if len(ring) < 2:
+            continue
+        edge_starts.append(ring)
+        edge_ends.append(np.roll(ring, -1, axis=0))
+        edge_rings.append(np.full(len(ring), ring_index))
+    if not edge_starts:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    p0 = np.concatenate(edge_starts)
+    p1 = np.concatenate(edge_ends)
+    edge_rings = np.concatenate(edge_rings)
+
+    # Rows whose center y + 0.5 lies in [min(y0, y1), max(y0, y1)) for each edge
+    y_low = np.minimum(p0[:, 1], p1[:, 1])
+    y_high = np.maximum(p0[:, 1], p1[:, 1])
+    row_start = np.ceil(y_low - 0.5).astype(np.int64)
+    counts = np.maximum(np.ceil(y_high - 0.5).astype(np.int64) - row_start, 0)
+    ids, positions = _expand(counts)
+    rows = row_start[ids] + positions
+    y_center = rows + 0.5
+    x_cross = p0[ids, 0] + (y_center - p0[ids, 1]) * (p1[ids, 0] - p0[ids, 0]) / (p1[ids, 1] - p0[ids, 1])
+    ring_ids = edge_rings[ids]
+
+    # Crossings sorted along each (ring, row) pair up as entering and leaving spans
+    order = np.lexsort((x_cross, rows, ring_ids))
+    x_cross, rows, ring_ids = x_cross[order], rows[order], ring_ids[order]
+    enter = np.arange(len(x_cross)) % 2 == 0
+    span_start = np.ceil(x_cross[enter] - 0.5).astype(np.int64)
+    span_stop = np.ceil(x_cross[~enter] - 0.5).astype(np.int64)
+    span_counts = np.maximum(span_stop - span_start, 0)
+    span_ids, span_positions = _expand(span_counts)
+    interior = np.column_stack([span_start[span_ids] + span_positions, rows[enter][span_ids]])
+    interior_rings = ring_ids[enter][span_ids]
+
+    flat = np.zeros((len(p0), 1))
+    boundary = np.concatenate(list(segment_voxels(np.hstack([p0, flat]), np.hstack([p1, flat]))))[:, :2]
+    boundary_rings = np.repeat(edge_rings, segment_voxel_counts(np.hstack([p0, flat]), np.hstack([p1, flat])))
+
+    columns = np.concatenate([interior, boundary])
+    column_rings = np.concatenate([interior_rings, boundary_rings])
+    keyed = np.unique(np.column_stack([column_rings, columns]), axis=0)
+    return keyed[:, 1:], keyed[:, 0]
+
+
+def prism_voxels(rings, z_bottom, z_top, chunk_size=1000000):
+    """Solid voxels of vertical extrusions of closed footprints from z_bottom to z_top."""
+    columns, ring_ids = footprint_columns(rings)
+    z_bottom = np.asarray(z_bottom, dtype=float)
+    z_top = np.asarray(z_top, dtype=float)
+    z_low = np.floor(z_bottom[ring_ids]).astype(np.int64)
+    z_high = np.maximum(np.ceil(z_top[ring_ids]).astype(np.int64), z_low + 1)
+    return _column_voxels(columns, z_low, z_high, chunk_size)
+
+
+def polygon_triangles(ring):
+    """(T, 3, 3) ear-clipping triangulation of a closed planar 3D ring, concave or not.
+
+    The ring is projected onto the plane of its largest Newell-normal component;
+    a repeated closing point is dropped.
+    """
+    ring = np.asarray(ring, dtype=float)
+    if len(ring) > 1 and np.allclose(ring[0], ring[-1]):
+        ring = ring[:-1]
+    if len(ring) < 3:
+        return np.zeros((0, 3, 3))
+    normal = np.cross(ring, np.roll(ring, -1, axis=0)).sum(axis=0)
+    dominant = np.abs(normal).argmax()
+    flat = ring[:, [(dominant + 1) % 3, (dominant + 2) % 3]]
+    if normal[dominant] < 0:
+        flat = flat[:, ::-1]  # wind counter-clockwise in the projection
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    remaining = list(range(len(ring)))
+    triangles = []
+    while len(remaining) > 3:
+        count = len(remaining)
+        for n in range(count):
+            i, j, k = remaining[n - 1], remaining[n], remaining[(n + 1) % count]
+            if cross(flat[i], flat[j], flat[k]) <= 1e-12:
+                continue  # reflex or collinear corner
+            others = [m for m in remaining if m not in (i, j, k)]
+            inside = [m for m in others if cross(flat[i], flat[j], flat[m]) >= 0 and
+                      cross(flat[j], flat[k], flat[m]) >= 0 and cross(flat[k], flat[i], flat[m]) >= 0]
+            if not inside:
+                triangles.append((i, j, k))
+                del remaining[n]
+                break
+        else:
+            # No ear left (self-intersecting or degenerate ring); fan out the rest
+            triangles.extend((remaining[0], remaining[m], remaining[m + 1]) for m in range(1, count - 1))
+            remaining = []
+    if len(remaining) == 3:
+        triangles.append(tuple(remaining))
+    return ring[np.array(triangles)]
+
+
+def _triangle_box_overlap(a, b, c, cells, tolerance=1e-9):
+    """Separating-axis test (Akenine-Moller) of triangles a, b, c against unit voxels at cells.
+
+    All arguments are (M, 3); touching counts as overlapping, so the test is conservative.
+    """
+    half = 0.5 + tolerance
+    center = cells + 0.5
+    v0, v1, v2 = a - center, b - center, c - center
+    # The voxel's own axes: the triangle's bounding box must reach into the voxel
+    overlap = np.all((np.minimum(np.minimum(v0, v1), v2) <= half) & (np.maximum(np.maximum(v0, v1), v2) >= -half), axis=1)
+    # The triangle's plane
+    normal = np.cross(v1 - v0, v2 - v0)
+    overlap &= np.abs(np.einsum('ij,ij->i', normal, v0)) <= half * np.abs(normal).sum(axis=1)
+    # Cross products of each voxel axis with each triangle edge
+    for edge in (v1 - v0, v2 - v1, v0 - v2):
+        ex, ey, ez = edge[:, 0], edge[:, 1], edge[:, 2]
+        for ax, ay, az in ((0 * ex, -ez, ey), (ez, 0 * ex, -ex), (-ey, ex, 0 * ex)):
+            p0 = ax * v0[:, 0] + ay * v0[:, 1] + az * v0[:, 2]
+            p1 = ax * v1[:, 0] + ay * v1[:, 1] + az * v1[:, 2]
+            p2 = ax * v2[:, 0] + ay * v2[:, 1] + az * v2[:, 2]
+            radius = half * (np.abs(ax) + np.abs(ay) + np.abs(az))
+            overlap &= (np.minimum(np.minimum(p0, p1), p2) <= radius) & (np.maximum(np.maximum(p0, p1), p2) >= -radius)
+    return overlap
+
+
+def triangle_voxels(triangles, chunk_size=1000000):
+    """Voxels overlapped by triangle surfaces (conservative voxelization).
+
+    Candidates are the voxels a triangle's plane passes through, column by
+    column along the axis its normal is closest to; each is kept if it passes a
+    triangle/box separating-axis test. Every voxel the surface touches is
+    marked, so open facade meshes stay watertight against rays at any angle.
+    Degenerate triangles are traced along their edges instead.
+    """
+    triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    normal = np.cross(b - a, c - a)
+    degenerate = np.abs(normal).max(axis=1) <= 1e-12 if len(triangles) else np.zeros(0, dtype=bool)
+    if np.any(degenerate):
+        flat = triangles[degenerate]
+        for voxels in segment_voxels(flat.reshape(-1, 3), np.roll(flat, -1, axis=1).reshape(-1, 3), chunk_size):
+            yield voxels
+        keep = ~degenerate
+        a, b, c, normal = a[keep], b[keep], c[keep], normal[keep]
+
+    dominant = np.abs(normal).argmax(axis=1)
+    rows = np.arange(len(normal))
+    p_axis, q_axis = (dominant + 1) % 3, (dominant + 2) % 3
+    low = np.floor(np.minimum(np.minimum(a, b), c)).astype(np.int64)
+    high = np.floor(np.maximum(np.maximum(a, b), c)).astype(np.int64)
+    p_low, q_low, d_low = low[rows, p_axis], low[rows, q_axis], low[rows, dominant]
+    q_width = high[rows, q_axis] - q_low + 1
+    d_high = high[rows, dominant]
+    column_counts = (high[rows, p_axis] - p_low + 1) * q_width
+    # The plane over a unit column spans d0 plus at most one unit per other axis
+    n_d = normal[rows, dominant]
+    slope_p = -normal[rows, p_axis] / n_d
+    slope_q = -normal[rows, q_axis] / n_d
+    offset = np.einsum('ij,ij->i', normal, a) / n_d
+
+    # Plane crossings span at most three voxels per column
+    for start, stop in _batches(column_counts * 3, chunk_size):
+        ids, positions = _expand(column_counts[start:stop])
+        ids += start
+        p = p_low[ids] + positions // q_width[ids]
+        q = q_low[ids] + positions % q_width[ids]
+        d0 = offset[ids] + slope_p[ids] * p + slope_q[ids] * q
+        d_min = d0 + np.minimum(slope_p[ids], 0) + np.minimum(slope_q[ids], 0)
+        d_max = d0 + np.maximum(slope_p[ids], 0) + np.maximum(slope_q[ids], 0)
+        first = np.maximum(np.floor(d_min - 1e-9).astype(np.int64), d_low[ids])
+        last = np.minimum(np.floor(d_max + 1e-9).astype(np.int64), d_high[ids])
+        cell_ids, cell_positions = _expand(np.maximum(last - first + 1, 0))
+        tri = ids[cell_ids]
+        cells = np.empty((len(tri), 3), dtype=np.int64)
+        cell_rows = np.arange(len(tri))
+        cells[cell_rows, dominant[tri]] = first[cell_ids] + cell_positions
+        cells[cell_rows, p_axis[tri]] = p[cell_ids]
+        cells[cell_rows, q_axis[tri]] = q[cell_ids]
+        yield cells[_triangle_box_overlap(a[tri], b[tri], c[tri], cells)]
+
+
+def closed_mesh_voxels(meshes, chunk_size=1000000):
+    """Solid voxels enclosed by closed triangle meshes, plus their surface.
+
+    For every column center a vertical scanline is intersected with all
+    triangles of the mesh at once; sorted hits pair up into filled z spans by
+    even-odd parity. `meshes` is a sequence of (T, 3, 3) triangle arrays.
+    """
+    meshes = [np.asarray(triangles, dtype=float).reshape(-1, 3, 3) for triangles in meshes]
+    if not meshes:
+        return
+    triangles = np.concatenate(meshes)
+    mesh_ids = np.repeat(np.arange(len(meshes)), [len(m) for m in meshes])
+
+    for voxels in triangle_voxels(triangles, chunk_size):
+        yield voxels
+
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    low = np.minimum(np.minimum(a, b), c)
+    high = np.maximum(np.maximum(a, b), c)
+    i_start = np.ceil(low[:, 0] - 0.5 - _JITTER_X).astype(np.int64)
+    j_start = np.ceil(low[:, 1] - 0.5 - _JITTER_Y).astype(np.int64)
+    nx = np.maximum(np.ceil(high[:, 0] - 0.5 - _JITTER_X).astype(np.int64) - i_start, 0)
+    ny = np.maximum(np.ceil(high[:, 1] - 0.5 - _JITTER_Y).astype(np.int64) - j_start, 0)
+    denominator = (b[:, 1] - c[:, 1]) * (a[:, 0] - c[:, 0]) + (c[:, 0] - b[:, 0]) * (a[:, 1] - c[:, 1])
+    # Triangles seen edge-on from above never cross a vertical scanline
+    counts = np.where(np.abs(denominator) > 1e-12, nx * ny, 0)
+
+    # Batch whole meshes so every crossing of a column is paired in the same pass
+    mesh_counts = np.bincount(mesh_ids, weights=counts, minlength=len(meshes)).astype(np.int64)
+    mesh_bounds = np.concatenate([[0], np.cumsum([len(m) for m in meshes])])
+    for first_mesh, last_mesh in _batches(mesh_counts, chunk_size):
+        first, last = mesh_bounds[first_mesh], mesh_bounds[last_mesh]
+        ids, positions = _expand(counts[first:last])
+        ids += first
+        i = i_start[ids] + positions // ny[ids]
+        j = j_start[ids] + positions % ny[ids]
+        px = i + 0.5 + _JITTER_X - c[ids, 0]
+        py = j + 0.5 + _JITTER_Y - c[ids, 1]
+        w0 = ((b[ids, 1] - c[ids, 1]) * px + (c[ids, 0] - b[ids, 0]) * py) / denominator[ids]
+        w1 = ((c[ids, 1] - a[ids, 1]) * px + (a[ids, 0] - c[ids, 0]) * py) / denominator[ids]
+        w2 = 1 - w0 - w1
+        inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        ids, i, j = ids[inside], i[inside], j[inside]
+        z = w0[inside] * a[ids, 2] + w1[inside] * b[ids, 2] + w2[inside] * c[ids, 2]
+        column_mesh = mesh_ids[ids]
+
+        order = np.lexsort((z, j, i, column_mesh))
+        z, i, j, column_mesh = z[order], i[order], j[order], column_mesh[order]
+        new_column = np.ones(len(z), dtype=bool)
+        new_column[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1]) | (column_mesh[1:] != column_mesh[:-1])
+        column_start = np.maximum.accumulate(np.where(new_column, np.arange(len(z)), 0))
+        rank = np.arange(len(z)) - column_start
+        # Pair each even crossing with the next one in the same column; a dangling odd hit is dropped
+        has_pair = np.zeros(len(z), dtype=bool)
+        has_pair[:-1] = ~new_column[1:]
+        enter = (rank % 2 == 0) & has_pair
+        exit_ = np.flatnonzero(enter) + 1
+        z_low = np.ceil(z[enter] - 0.5).astype(np.int64)
+        z_high = np.ceil(z[exit_] - 0.5).astype(np.int64)
+        for voxels in _column_voxels(np.column_stack([i[enter], j[enter]]), z_low, z_high, chunk_size):
+            yield voxels
@@ -0,0 +1,325 @@
+"""Vectorized shadow casting over a voxel occupancy grid."""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from instrumentation import Counters, current
+from voxel_grid import BrickGrid, SparseVoxelValues
+
+
+def _occupied_extent(grid):
+    """Return the per-axis (min, max) index of occupied voxels, or None if the grid is empty."""
+    extent = []
+    for axis in range(grid.ndim):
+        other_axes = tuple(a for a in range(grid.ndim) if a != axis)
+        occupied = np.flatnonzero(grid.any(axis=other_axes))
+        if occupied.size == 0:
+            return None
+        extent.append((occupied[0], occupied[-1]))
+    return extent
+
+
+def ray_offsets(sun_vector, shape, extent=None):
+    """Integer voxel offsets visited by a ray marching from a voxel toward the sun.
+
+    The ray advances one voxel per step along its dominant axis and a fractional
+    amount along the others, so shallow and oblique sun angles are traced along
+    the actual sun direction rather than the sign of each component. Marching
+    stops once no ray can reach an occupied voxel anymore.
+    """
+    direction = np.asarray(sun_vector, dtype=float)
+    dominant = np.abs(direction).max()
+    if dominant == 0:
+        return np.zeros((0, 3), dtype=int)
+    step = direction / dominant
+
+    if extent is None:
+        extent = [(0, size - 1) for size in shape]
+
+    max_steps = None
+    for axis in range(3):
+        if step[axis] == 0:
+            continue
+        lo, hi = extent[axis]
+        # Furthest an in-grid ray can travel along this axis and still hit something
+        reach = hi if step[axis] > 0 else shape[axis] - 1 - lo
+        axis_steps = int(np.floor(reach / abs(step[axis]) + 1e-9))
+        max_steps = axis_steps if max_steps is None else min(max_steps, axis_steps)
+
+    if not max_steps:
+        return np.zeros((0, 3), dtype=int)
+
+    offsets = np.rint(np.outer(np.arange(1, max_steps + 1), step)).astype(int)
+    # Rounding can revisit the same voxel offset on consecutive steps
+    keep = np.ones(len(offsets), dtype=bool)
+    keep[1:] = np.any(offsets[1:] != offsets[:-1], axis=1)
+    return offsets[keep]
+
+
+def _shifted_slices(offset, shape, extent):
+    """Slices such that dst[v] corresponds to src[v + offset], clipped to the occupied extent.
+
+    Returns None when the shifted occupied region falls outside the grid.
+    """
+    dst, src = [], []
+    for o, size, (lo, hi) in zip(offset, shape, extent):
+        start = max(0, lo - o)
+        stop = min(size, hi + 1 - o)
+        if start >= stop:
+            return None
+        dst.append(slice(start, stop))
+        src.append(slice(start + o, stop + o))
+    return tuple(dst), tuple(src)
+
+
+def cast_shadow(buildings_voxel_grid, sun_vector, extent=None, out=None):
+    """Shadow mask for one sun direction.
+
+    A voxel is in shadow when the ray from it toward the sun passes through an
+    occupied voxel. Every ray is advanced at once by OR-ing shifted slabs of the
+    occupancy grid, one slab per ray step. Sun vectors at or below the horizon
+    shade the whole grid.
+    """
+    grid = np.asarray(buildings_voxel_grid, dtype=bool)
+    if out is None:
+        out = np.zeros(grid.shape, dtype=bool)
+    else:
+        out[...] = False
+
+    if sun_vector[2] <= 0:
+        out[...] = True
+        return out
+
+    if extent is None:
+        extent = _occupied_extent(grid)
+        if extent is None:
+            return out
+
+    for offset in ray_offsets(sun_vector, grid.shape, extent):
+        slices = _shifted_slices(offset, grid.shape, extent)
+        if slices is None:
+            continue
+        dst, src = slices
+        out[dst] |= grid[src]
+    return out
+
+
+def cast_shadow_sparse(grid, receivers, sun_vector, extent=None):
+    """Shadow flags for the voxels at `receivers` (an (M, 3) index array) in a BrickGrid.
+
+    Same rays as cast_shadow, but only receiver voxels are traced: all of them are
+    advanced together one step at a time, and rays drop out as soon as they hit
+    an occupied voxel or leave the occupied extent.
+    """
+    blocked = np.zeros(len(receivers), dtype=bool)
+    if sun_vector[2] <= 0:
+        blocked[:] = True
+        return blocked
+    if extent is None:
+        extent = grid.extent()
+        if extent is None:
+            return blocked
+
+    step = np.sign(np.asarray(sun_vector, dtype=float))
+    lo = np.array([lo for lo, _ in extent])
+    hi = np.array([hi for _, hi in extent])
+    active = np.arange(len(receivers))
+    for offset in ray_offsets(sun_vector, grid.shape, extent):
+        if not active.size:
+            break
+        points = receivers[active] + offset
+        hit = grid.contains(points)
+        blocked[active[hit]] = True
+        # A ray that has moved past the occupied extent can never be shaded again
+        escaped = np.any(((points > hi) & (step > 0)) | ((points < lo) & (step < 0)), axis=1)
+        active = active[~hit & ~escaped]
+    return blocked
+
+
+def _surface_mask(grid):
+    """Occupied voxels with an empty or out-of-grid face neighbour, as BrickGrid.surface_indices."""
+    padded = np.pad(np.asarray(grid, dtype=bool), 1)
+    interior = np.ones(grid.shape, dtype=bool)
+    for axis in range(3):
+        for step in (0, 2):
+            index = [slice(1, -1)] * 3
+            index[axis] = slice(step, step + grid.shape[axis])
+            interior &= padded[tuple(index)]
+    return padded[1:-1, 1:-1, 1:-1] & ~interior
+
+
+def _accumulate_sunlight(grid, sun_positions, extent, dtype=int, progress=None, weights=None, run=None):
+    """Count, per voxel, the sun positions that reach it without being shaded.
+
+    With weights, each unshaded sun position adds its weight instead of one.
+    When run is recording, the shaded surface voxels of every position are
+    counted as voxels_shadowed, the same receivers the sparse path counts.
+    """
+    surface = _surface_mask(grid) if run is not None and run.enabled else None
+    weights = np.ones(len(sun_positions), dtype=dtype) if weights is None else np.asarray(weights).astype(dtype)
+    sunlight_hours = np.zeros(grid.shape, dtype=dtype)
+    if extent is None:
+        # Nothing can cast a shadow; every voxel sees every sun position above the horizon
+        sunlight_hours += sum(weight for sun_pos, weight in zip(sun_positions, weights) if sun_pos[2] > 0)
+        return sunlight_hours
+
+    shadow_mask = np.empty(grid.shape, dtype=bool)
+    for sun_pos, weight in zip(sun_positions, weights):
+        cast_shadow(grid, sun_pos, extent, out=shadow_mask)
+        if surface is not None:
+            run.count("voxels_shadowed", int(np.count_nonzero(shadow_mask & surface)))
+        if weight == 1:
+            sunlight_hours += ~shadow_mask
+        else:
+            sunlight_hours[~shadow_mask] += weight
+        if progress is not None:
+            progress.update(1)
+    return sunlight_hours
+
+
+def _accumulate_sunlight_sparse(grid, receivers, sun_positions, extent, dtype, progress=None, weights=None, run=None):
+    """Count, per receiver voxel of a BrickGrid, the sun positions (or their weights) that reach it."""
+    counting = run is not None and run.enabled
+    weights = np.ones(len(sun_positions), dtype=dtype) if weights is None else np.asarray(weights).astype(dtype)
+    sunlight_hours = np.zeros(len(receivers), dtype=dtype)
+    for sun_pos, weight in zip(sun_positions, weights):
+        lit = ~cast_shadow_sparse(grid, receivers, sun_pos, extent)
+        if counting:
+            run.count("voxels_shadowed", len(lit) - int(np.count_nonzero(lit)))
+        if weight == 1:
+            sunlight_hours += lit
+        else:
+            sunlight_hours[lit] += weight
+        if progress is not None:
+            progress.update(1)
+    return sunlight_hours
+
+
+def calculate_sunlight_hours(buildings_voxel_grid, sun_positions, voxel_size, weights=None):
+    """Calculate sunlight hours based on voxelized building grids and sun positions.
+
+    A BrickGrid yields SparseVoxelValues holding hours for its surface voxels only,
+    counted in the narrowest unsigned dtype; a dense array yields a dense int array.
+    weights, one per sun position (e.g. hours per sky patch from
+    sky_patches.bin_sun_vectors), replace the count of one per position.
+    """
+    run = current()
+    with run.progress("Processing Sun Positions", len(sun_positions)) as progress:
+        if isinstance(buildings_voxel_grid, BrickGrid):
+            receivers = buildings_voxel_grid.surface_indices()
+            hours = _accumulate_sunlight_sparse(buildings_voxel_grid, receivers, sun_positions, buildings_voxel_grid.extent(),
+                                                _hours_dtype(len(sun_positions), weights), progress=progress, weights=weights,
+                                                run=run)
+            return SparseVoxelValues(receivers, hours, buildings_voxel_grid.shape)
+
+        grid = np.asarray(buildings_voxel_grid, dtype=bool)
+        dtype = int if weights is None else _hours_dtype(len(sun_positions), weights)
+        return _accumulate_sunlight(grid, sun_positions, _occupied_extent(grid), dtype=dtype, progress=progress, weights=weights,
+                                    run=run)
+
+
+def _counter_dtype(max_count):
+    """Smallest unsigned dtype that can hold a per-voxel count up to max_count."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_count <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def _hours_dtype(sun_count, weights=None):
+    """Counter dtype for unweighted or whole-number weights, float64 for fractional weights."""
+    if weights is None:
+        return _counter_dtype(sun_count)
+    weights = np.asarray(weights)
+    if np.all(weights >= 0) and np.all(np.mod(weights, 1) == 0):
+        return _counter_dtype(int(weights.sum()))
+    return np.float64
+
+
+def _sunlight_hours_worker(grid_path, sun_positions, extent, weights=None, dtype=None, count=False, receivers_path=None):
+    """Process-pool entry point: count sunlight for one chunk of sun positions.
+
+    A BrickGrid directory comes with receivers_path, the parent's surface voxels
+    saved as .npy, which is memory-mapped rather than recomputed per chunk.
+    Returns the partial hours and, when count is set, the chunk's counters for the parent run.
+    """
+    dtype = dtype or _counter_dtype(len(sun_positions))
+    tally = Counters() if count else None
+    if os.path.isdir(grid_path):
+        grid = BrickGrid.load(grid_path, mmap_mode='r')
+        receivers = np.load(receivers_path, mmap_mode='r')
+        hours = _accumulate_sunlight_sparse(grid, receivers, sun_positions, extent, dtype, weights=weights, run=tally)
+    else:
+        grid = np.load(grid_path, mmap_mode='r')
+        hours = _accumulate_sunlight(grid, sun_positions, extent, dtype=dtype, weights=weights, run=tally)
+    return hours, (tally.counters if tally else {})
+
+
+def calculate_sunlight_hours_parallel(buildings_voxel_grid, sun_positions, voxel_size, max_workers=None, chunk_size=None,
+                                      weights=None):
+    """Calculate sunlight hours with sun positions split across a process pool.
+
+    The occupancy grid, and for a BrickGrid its surface voxels, are written once
+    to memory-mapped .npy files that every worker opens read-only, so they are
+    never pickled or recomputed per task. Each worker returns
+    the partial counts for its chunk, which are summed into the final result.
+    Unweighted counts and whole-number weights are identical to
+    calculate_sunlight_hours; fractional weights are summed per chunk in
+    completion order, so they agree only to floating-point rounding.
+    """
+    sparse = isinstance(buildings_voxel_grid, BrickGrid)
+    if sparse:
+        grid = buildings_voxel_grid
+        receivers = grid.surface_indices()
+        extent = grid.extent()
+        dtype = _hours_dtype(len(sun_positions), weights)
+    else:
+        grid = np.asarray(buildings_voxel_grid, dtype=bool)
+        extent = _occupied_extent(grid)
+        dtype = int if weights is None else _hours_dtype(len(sun_positions), weights)
+    sunlight_hours = np.zeros(len(receivers) if sparse else grid.shape, dtype=dtype)
+
+    sun_positions = [np.asarray(sun_pos, dtype=float) for sun_pos in sun_positions]
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool busy when chunks finish unevenly
+        chunk_size = max(1, -(-len(sun_positions) // (max_workers * 4)))
+    chunks = [sun_positions[i:i + chunk_size] for i in range(0, len(sun_positions), chunk_size)]
+    weight_chunks = [None] * len(chunks) if weights is None else \
+        [np.asarray(weights)[i:i + chunk_size] for i in range(0, len(sun_positions), chunk_size)]
+    # Unweighted chunks count in their own narrow dtype; weighted ones need the final dtype
+    worker_dtype = None if weights is None else dtype
+
+    if chunks:
+        temp_dir = tempfile.mkdtemp(prefix="voxel_grid_")
+        try:
+            receivers_path = None
+            if sparse:
+                grid_path = os.path.join(temp_dir, "grid")
+                os.mkdir(grid_path)
+                grid.save(grid_path)
+                receivers_path = os.path.join(temp_dir, "receivers.npy")
+                np.save(receivers_path, receivers)
+            else:
+                grid_path = os.path.join(temp_dir, "grid.npy")
+                np.save(grid_path, grid)
+            run = current()
+            with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+                    run.progress("Processing Sun Positions", len(sun_positions)) as progress:
+                futures = {executor.submit(_sunlight_hours_worker, grid_path, chunk, extent, chunk_weights, worker_dtype,
+                                           run.enabled, receivers_path): len(chunk)
+                           for chunk, chunk_weights in zip(chunks, weight_chunks)}
+                for future in as_completed(futures):
+                    partial_hours, counters = future.result()
+                    sunlight_hours += partial_hours
+                    run.merge(counters)
+                    progress.update(futures[future])
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if sparse:
+        return SparseVoxelValues(receivers, sunlight_hours, grid.shape)
+    return sunlight_hours
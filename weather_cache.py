@@ -0,0 +1,121 @@
+"""Content-addressed on-disk cache for weather downloads and parsed EPW frames."""
+import hashlib
+import json
+import os
+import tempfile
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+
+class WeatherCache(object):
+    """Local cache of remote weather files keyed by URL.
+
+    Raw responses are stored as <sha256(url)>.raw and parsed EPW tables as
+    <sha256(url)>.npz with one array per column plus the frame's attrs as JSON.
+    Small JSON values such as geocoding results are stored as .raw entries too.
+    Entries are evicted least recently used first once the directory grows past
+    max_bytes. In offline mode a miss raises instead of touching the network,
+    and fixture_dir, when given, serves files by URL basename in place of the
+    remote server.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, offline=False, fixture_dir=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.fixture_dir = fixture_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + suffix)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path, None)  # mark as recently used
+        return data
+
+    def _write(self, path, write):
+        """Write through a temporary file so concurrent jobs never see a partial entry."""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._evict()
+
+    def _download(self, url):
+        if self.fixture_dir is not None:
+            fixture = os.path.join(self.fixture_dir, os.path.basename(urlparse(url).path))
+            if not os.path.exists(fixture):
+                raise Exception(f"No fixture file for {url} in {self.fixture_dir}")
+            with open(fixture, 'rb') as f:
+                return f.read()
+        if self.offline:
+            raise Exception(f"{url} is not cached and the cache is offline")
+        response = requests.get(url)
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch {url}. Status code: {response.status_code}")
+        return response.content
+
+    def fetch(self, url):
+        """Raw bytes for url, downloading and caching them on a miss."""
+        path = self._path(url, '.raw')
+        if os.path.exists(path):
+            return self._read(path)
+        content = self._download(url)
+        self._write(path, lambda f: f.write(content))
+        return content
+
+    def get_frame(self, url):
+        """Parsed DataFrame cached for url, or None.
+
+        Entries written before frames carried their attrs count as misses, so
+        callers re-parse and overwrite them.
+        """
+        path = self._path(url, '.npz')
+        if not os.path.exists(path):
+            return None
+        os.utime(path, None)
+        with np.load(path, allow_pickle=False) as data:
+            if 'attrs' not in data.files:
+                return None
+            columns = [str(column) for column in data['columns']]
+            df = pd.DataFrame({column: data[f"c{i}"] for i, column in enumerate(columns)}, columns=columns)
+            df.attrs.update(json.loads(str(data['attrs'])))
+            return df
+
+    def put_frame(self, url, df):
+        arrays = {f"c{i}": df[column].to_numpy() if pd.api.types.is_numeric_dtype(df[column]) else df[column].to_numpy(dtype=str)
+                  for i, column in enumerate(df.columns)}
+        self._write(self._path(url, '.npz'), lambda f: np.savez(f, columns=np.array(df.columns, dtype=str), attrs=np.array(json.dumps(df.attrs)), **arrays))
+
+    def get_json(self, key):
+        """JSON value cached under key (e.g. a geocoding result), or None."""
+        path = self._path(key, '.raw')
+        if not os.path.exists(path):
+            return None
+        return json.loads(self._read(path).decode('utf-8'))
+
+    def put_json(self, key, value):
+        content = json.dumps(value).encode('utf-8')
+        self._write(self._path(key, '.raw'), lambda f: f.write(content))
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.raw', '.npz')):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size